@@ -0,0 +1,307 @@
+import argparse
+import io
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (
+    align_dates, build_sheet_slice, compact_frame, parse_date, parse_date_headers, process_data,
+    STATIC_COLS
+)
+from data_config import COMPACT_FRAMES
+from compliance import ComplianceMatrix
+from districts import slugify
+from grouping import rank_groups, week_key
+from query import DataQuery, get_query, put_query
+from refresher import DatasetVersion, state_view
+from rollups import Rollups, StateRollups
+from utils import filter_by_date, filter_by_week, get_missing_forms_count, memory_report
+
+
+def make_wide_sheet(n_vles, n_days, end=None, seed=0, sdm="SDM BENCH", smo_name="Dr. Bench", first_vle=0):
+    # One wide sheet shaped like the real ones: static columns, then one
+    # "DD Mon" column per day ending at `end`, with ~30% empty cells.
+    # Headers carry no year, so n_days is at most 365.
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now()
+    days = [end - timedelta(days=i) for i in range(n_days - 1, -1, -1)]
+    ids = range(first_vle, first_vle + n_vles)
+    data = {
+        'Sr No': np.arange(1, n_vles + 1),
+        'CSC ID': [f"CSC{i:06d}" for i in ids],
+        'VLE Name': [f"VLE {i}" for i in ids],
+        'VLE Contact Number': [f"98{i:08d}" for i in ids],
+        'SMO': "SMO",
+        'SDM': sdm,
+        'SMO Name': smo_name,
+    }
+    for day in days:
+        values = rng.integers(0, 20, n_vles).astype(float)
+        values[rng.random(n_vles) < 0.3] = np.nan
+        data[day.strftime("%d %b")] = values
+    return pd.DataFrame(data)
+
+
+def make_district(n_sdms, n_smos, n_vles, n_days, end=None, seed=0, first_gid=1000, first_vle=0):
+    # A synthetic district: an SDM_MAPPING-shaped dict and the CSV bytes of
+    # every SMO tab keyed by gid. SMOs are dealt round-robin to SDMs and
+    # VLEs split evenly across SMOs.
+    if n_smos < n_sdms:
+        raise ValueError("need at least one SMO per SDM")
+    end = end or datetime.now()
+    mapping = {f"SDM {i + 1}": [] for i in range(n_sdms)}
+    sheets = {}
+    per_smo, extra = divmod(n_vles, n_smos)
+    for j in range(n_smos):
+        sdm = f"SDM {j % n_sdms + 1}"
+        gid = str(first_gid + j)
+        smo_name = f"Dr. SMO {j + 1}"
+        count = per_smo + (1 if j < extra else 0)
+        wide = make_wide_sheet(count, n_days, end, seed + j, sdm, smo_name, first_vle)
+        sheets[gid] = wide.to_csv(index=False).encode()
+        mapping[sdm].append({"gid": gid, "smo_name": smo_name})
+        first_vle += count
+    return mapping, sheets
+
+
+def make_state(n_districts, n_sdms, n_smos, n_vles, n_days, end=None, seed=0):
+    # {district name: (mapping, sheets)} for a synthetic state: every
+    # district has n_sdms SDMs and n_smos SMOs, the n_vles VLEs are split
+    # evenly across districts, and gids / VLE numbers are unique state-wide
+    end = end or datetime.now()
+    per_district, extra = divmod(n_vles, n_districts)
+    state = {}
+    first_vle = 0
+    for d in range(n_districts):
+        count = per_district + (1 if d < extra else 0)
+        state[f"District {d + 1}"] = make_district(n_sdms, n_smos, count, n_days, end, seed + d * n_smos,
+                                                   first_gid=1000 + d * n_smos, first_vle=first_vle)
+        first_vle += count
+    return state
+
+
+def write_district(directory, mapping, sheets):
+    # <gid>.csv per tab plus mapping.json, for feeding other tools
+    os.makedirs(directory, exist_ok=True)
+    for gid, body in sheets.items():
+        with open(os.path.join(directory, f"{gid}.csv"), "wb") as f:
+            f.write(body)
+    with open(os.path.join(directory, "mapping.json"), "w") as f:
+        json.dump(mapping, f, indent=2)
+
+
+def legacy_date_parse(melted_df):
+    # The pre-vectorisation path: strptime + datetime.now() on every row
+    return melted_df['Date_Str'].astype(object).apply(parse_date)
+
+
+def time_call(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(fn, *args, repeat=3, memory=True):
+    # Best wall time of `repeat` runs, then one more run under tracemalloc
+    # for the peak memory the stage allocates. Returns (seconds, peak
+    # bytes, result); peak is None with memory=False, as tracemalloc slows
+    # the pandas stages several times over at state scale.
+    seconds = time_call(fn, *args, repeat=repeat)
+    if not memory:
+        return seconds, None, fn(*args)
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak, result
+
+
+def _parse_sheets(sheets):
+    return {gid: pd.read_csv(io.BytesIO(body)) for gid, body in sheets.items()}
+
+
+def _melt_sheets(wides):
+    melted = []
+    for wide in wides.values():
+        date_cols = [c for c in wide.columns if c not in STATIC_COLS]
+        melted.append(wide.melt(id_vars=[c for c in STATIC_COLS if c in wide.columns],
+                                value_vars=date_cols, var_name='Date_Str',
+                                value_name='Cards Issued'))
+    return melted
+
+
+def _parse_headers(wides, today):
+    return [parse_date_headers([c for c in wide.columns if c not in STATIC_COLS], today)
+            for wide in wides.values()]
+
+
+def _process_sheets(wides, mapping, today):
+    slices = []
+    for sdm, smos in mapping.items():
+        for smo_info in smos:
+            slices.append(build_sheet_slice(wides[smo_info["gid"]], sdm, smo_info["smo_name"], today))
+    return slices
+
+
+def _combine(slices):
+    combined = pd.concat(align_dates(slices), ignore_index=True)
+    return compact_frame(combined) if COMPACT_FRAMES else combined
+
+
+def _per_district(fn, per_district, *shared):
+    # {district: fn(*that district's arguments, *shared)}; `per_district`
+    # maps each district to a tuple of its own arguments
+    return {name: fn(*values, *shared) for name, values in per_district.items()}
+
+
+def _filters(df, date, week, sdm, smo):
+    query = get_query(df)
+    return (filter_by_date(df, date), filter_by_week(df, week),
+            query.slice(sdm=sdm), query.slice(smo=smo), query.slice(date=date, sdm=sdm))
+
+
+def _groupbys(df, rollups):
+    per_sdm = {sdm: get_missing_forms_count(part)
+               for sdm, part in df.groupby('SDM', observed=True)}
+    return (rank_groups(df, 'VLE Name'), rank_groups(df, 'SMO Name'), per_sdm,
+            rollups.rank('vle', 'all'))
+
+
+def _compliance_queries(matrix, date, sdm):
+    return (matrix.missing_counts('smo', date, sdm=sdm), matrix.missing_vles(date, sdm),
+            matrix.streak_vles(3, date), matrix.heatmap('smo'))
+
+
+class _Published:
+    # Stands in for a district's BackgroundRefresher in state_view
+    def __init__(self, version):
+        self._version = version
+
+    def current(self):
+        return self._version
+
+
+def _state_queries(refreshers, date):
+    state, _ = state_view(refreshers)
+    return (state.table("district", "day", date), state.table("sdm", "month", date),
+            state.rank("district", "week", date), state.rank("sdm", "all"))
+
+
+def bench_pipeline(n_sdms, n_smos, n_vles, n_days, repeat=3, out=None, n_districts=1, memory=True):
+    # Every stage between the sheet CSVs and the dashboard numbers, timed
+    # and memory-profiled one after the other on a synthetic state. The
+    # per-district stages are timed over all districts together; the state
+    # stages build StateRollups and answer the state dashboard's queries.
+    # The headers are dated against the day the sheets end on, as the
+    # dashboards date them against the current day.
+    today = datetime.now()
+    state = make_state(n_districts, n_sdms, n_smos, n_vles, n_days, end=today)
+    if out:
+        for name, (mapping, sheets) in state.items():
+            write_district(os.path.join(out, slugify(name)) if n_districts > 1 else out, mapping, sheets)
+    csv_bytes = sum(len(body) for _, sheets in state.values() for body in sheets.values())
+    print(f"pipeline    {n_districts} districts x {n_sdms} SDMs / {n_smos} SMOs, {n_vles} VLEs x {n_days} days "
+          f"({csv_bytes / 2**20:.1f} MB of CSV)", flush=True)
+
+    rows = []
+
+    def stage(name, fn, *args):
+        # The name goes out first so a slow stage shows where the run is
+        print(f"  {name:<22}", end=" ", flush=True)
+        seconds, peak, result = measure(fn, *args, repeat=repeat, memory=memory)
+        rows.append((name, seconds, peak))
+        print(f"{seconds * 1000:10.1f} ms" + (f"   peak {peak / 2**20:8.1f} MB" if memory else ""), flush=True)
+        return result
+
+    sheets = {name: (sheets,) for name, (_, sheets) in state.items()}
+    wides = stage("parse csv", _per_district, _parse_sheets, sheets)
+    stage("melt", _per_district, _melt_sheets, {name: (w,) for name, w in wides.items()})
+    stage("date headers", _per_district, _parse_headers, {name: (w,) for name, w in wides.items()}, today)
+    slices = stage("process_data", _per_district, _process_sheets,
+                   {name: (wides[name], mapping) for name, (mapping, _) in state.items()}, today)
+    dfs = stage("combine", _per_district, _combine, {name: (s,) for name, s in slices.items()})
+    queries = stage("index", _per_district, DataQuery, {name: (df,) for name, df in dfs.items()})
+    for name, df in dfs.items():
+        put_query(df, queries[name])
+    latest = max(df['Date'].max() for df in dfs.values())
+    week = week_key(latest)
+    interactions = {}
+    for name, (mapping, _) in state.items():
+        sdm = next(iter(mapping))
+        interactions[name] = (dfs[name], latest, week, sdm, mapping[sdm][0]["smo_name"])
+    stage("filters", _per_district, _filters, interactions)
+    rollups = stage("rollups", _per_district, Rollups, {name: (df,) for name, df in dfs.items()})
+    stage("group-bys", _per_district, _groupbys, {name: (dfs[name], rollups[name]) for name in dfs})
+    matrices = stage("compliance matrix", _per_district, ComplianceMatrix, {name: (df,) for name, df in dfs.items()})
+    stage("compliance queries", _per_district, _compliance_queries,
+          {name: (matrices[name], latest, interactions[name][3]) for name in dfs})
+    stage("state rollups", StateRollups, rollups)
+    refreshers = {
+        name: _Published(DatasetVersion(version=1, df=df, rollups=rollups[name], query=queries[name],
+                                        published_at=time.time(), district=name))
+        for name, df in dfs.items()
+    }
+    stage("state view", _state_queries, refreshers, latest)
+
+    frame_bytes = sum(memory_report(df)['total_bytes'] for df in dfs.values())
+    frame_rows = sum(len(df) for df in dfs.values())
+    print(f"  frames: {frame_rows:,} rows, {frame_bytes / 2**20:.1f} MB "
+          f"({frame_bytes / max(frame_rows, 1):.0f} bytes/row)")
+    return rows
+
+
+def bench_date_parse(n_vles, n_days):
+    today = datetime.now()
+    wide = make_wide_sheet(n_vles, n_days, end=today)
+    melted = process_data(wide, today, compact=False)
+    legacy = time_call(legacy_date_parse, melted)
+    vectorized = time_call(process_data, wide, today)
+    print(f"date parse  {n_vles} VLEs x {n_days} days ({len(melted):,} rows)")
+    print(f"  per-row apply (date column only): {legacy * 1000:9.1f} ms")
+    print(f"  vectorized process_data (total):  {vectorized * 1000:9.1f} ms")
+    print(f"  speed-up:                         {legacy / vectorized:9.1f}x")
+
+
+def bench_memory(n_vles, n_days):
+    today = datetime.now()
+    wide = make_wide_sheet(n_vles, n_days, end=today)
+    print(f"memory      {n_vles} VLEs x {n_days} days")
+    for label, compact in (("object/float", False), ("compact", True)):
+        report = memory_report(process_data(wide, today, compact=compact))
+        print(f"  {label:<13} {report['total_bytes'] / 2**20:8.2f} MB  "
+              f"{report['bytes_per_row']:6.1f} bytes/row")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the data processing hot paths")
+    parser.add_argument("--districts", type=int, default=1)
+    parser.add_argument("--sdms", type=int, default=7, help="SDMs per district")
+    parser.add_argument("--smos", type=int, default=20, help="SMOs per district")
+    parser.add_argument("--vles", type=int, default=500, help="VLEs in the whole state")
+    parser.add_argument("--days", type=int, default=120, help="at most 365")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="also write the generated sheet CSVs here")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc pass (much faster at state scale)")
+    parser.add_argument("--micro", action="store_true",
+                        help="also run the date-parse and memory comparisons")
+    args = parser.parse_args()
+    if not 0 < args.days <= 365:
+        parser.error("--days must be between 1 and 365")
+    if args.districts < 1:
+        parser.error("--districts must be at least 1")
+    bench_pipeline(args.sdms, args.smos, args.vles, args.days, args.repeat, args.out, args.districts,
+                   not args.no_memory)
+    if args.micro:
+        bench_date_parse(args.vles, args.days)
+        bench_memory(args.vles, args.days)
@@ -0,0 +1,186 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+import frame_cache
+from metrics import REGISTRY
+
+# Columns identifying one VLE row of the matrix, as far as the frame has them
+VLE_COLS = ['SDM', 'SMO Name', 'VLE Name', 'VLE Contact Number', 'CSC ID']
+
+# Grouping columns of each level; SMO names are only unique within an SDM
+LEVELS = {"sdm": ["SDM"], "smo": ["SDM", "SMO Name"]}
+
+
+class ComplianceMatrix:
+    # Dense VLE x date matrix of who filled the form, built once per data
+    # refresh. `filled` and `missing` are boolean arrays with one row per
+    # VLE (`vles`, sorted by SDM, SMO and VLE so every SDM and every SMO
+    # is a contiguous block of rows) and one column per date (`dates`); a
+    # VLE without a row for some date counts as neither. Missing-form
+    # counts, VLE lists and streaks become array operations instead of
+    # masks over the long frame.
+
+    def __init__(self, df):
+        keys = [c for c in VLE_COLS if c in df.columns]
+        if 'Date' in df.columns:
+            df = df[df['Date'].notna()]
+        if df.empty or 'Date' not in df.columns:
+            self.vles = pd.DataFrame(columns=keys)
+            self._ordinals = np.zeros(0, dtype=np.int64)
+            self.dates = pd.DatetimeIndex([])
+            self.filled = np.zeros((0, 0), dtype=bool)
+            self.missing = np.zeros((0, 0), dtype=bool)
+            self._groups = {level: (np.zeros(0, dtype=np.intp), []) for level in LEVELS}
+            return
+
+        # One matrix row per sheet row: VLE rows that repeat the same keys
+        # (duplicates, blank names or contacts) are told apart by their
+        # ordinal among those rows on each date, as deltas._cells numbers them
+        ordinal = df.groupby(keys + ['Date'], observed=True, dropna=False, sort=False).cumcount()
+        rows = df[keys].assign(_n=ordinal).groupby(
+            keys + ['_n'], observed=True, dropna=False, sort=True).ngroup().to_numpy()
+        order = np.argsort(rows, kind='stable')
+        firsts = order[np.r_[0, np.flatnonzero(np.diff(rows[order])) + 1]]
+        self.vles = df[keys].iloc[firsts].reset_index(drop=True)
+        self._ordinals = ordinal.to_numpy()[firsts]
+        self.dates = pd.DatetimeIndex(np.unique(df['Date'].to_numpy()))
+        cols = self.dates.searchsorted(df['Date'].to_numpy())
+        shape = (len(self.vles), len(self.dates))
+
+        present = np.zeros(shape, dtype=bool)
+        present[rows, cols] = True
+        self.filled = np.zeros(shape, dtype=bool)
+        filled_rows = df['Cards Issued'].notna().to_numpy()
+        self.filled[rows[filled_rows], cols[filled_rows]] = True
+        self.missing = present & ~self.filled
+
+        # First row and (SDM[, SMO]) label of every group, per level
+        self._groups = {}
+        for level, columns in LEVELS.items():
+            labels = list(zip(*(self.vles[c].astype(object) for c in columns)))
+            starts = [i for i in range(len(labels)) if i == 0 or labels[i] != labels[i - 1]]
+            self._groups[level] = (np.array(starts, dtype=np.intp), [labels[i] for i in starts])
+
+    @property
+    def empty(self):
+        return self.missing.size == 0
+
+    def apply_changes(self, changes):
+        # New matrix with value-only cell changes (see deltas.diff_slices)
+        # applied: a cell is filled or missing by its new count. Returns
+        # None if a change is outside the matrix (new VLE or date).
+        keys = list(self.vles.columns)
+        if self.empty or not set(keys + ['_n']) <= set(changes.columns):
+            return None
+        cells = pd.MultiIndex.from_frame(self.vles.astype(object).assign(_n=self._ordinals))
+        rows = cells.get_indexer(pd.MultiIndex.from_frame(changes[keys + ['_n']].astype(object)))
+        cols = self.dates.get_indexer(pd.DatetimeIndex(changes['Date']))
+        if (rows < 0).any() or (cols < 0).any():
+            return None
+        patched = copy.copy(self)
+        patched.filled = self.filled.copy()
+        patched.missing = self.missing.copy()
+        filled = changes['New'].notna().to_numpy()
+        patched.filled[rows, cols] = filled
+        patched.missing[rows, cols] = ~filled
+        return patched
+
+    def _columns(self, date=None, start=None, end=None):
+        # Column slice for one date or an inclusive date range
+        if date is not None:
+            start = end = date
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        return slice(lo, hi)
+
+    def _rows(self, sdm=None, smo=None):
+        mask = np.ones(len(self.vles), dtype=bool)
+        if sdm is not None:
+            mask &= (self.vles['SDM'] == sdm).to_numpy()
+        if smo is not None:
+            mask &= (self.vles['SMO Name'] == smo).to_numpy()
+        return mask
+
+    def _group_sums(self, level, values, sdm=None):
+        # Sum the per-VLE rows of `values` into one row per group, keeping
+        # only the groups of `sdm` if given. Returns (labels, sums).
+        starts, labels = self._groups[level]
+        if len(starts) == 0:
+            return [], np.zeros((0,) + values.shape[1:], dtype=np.int64)
+        sums = np.add.reduceat(values.astype(np.int64), starts, axis=0)
+        keep = [i for i, label in enumerate(labels) if sdm is None or label[0] == sdm]
+        return [labels[i] for i in keep], sums[keep]
+
+    def missing_counts(self, level, date=None, start=None, end=None, sdm=None):
+        # {name: missing forms} for every SDM / SMO over one date or a range
+        labels, sums = self._group_sums(level, self.missing[:, self._columns(date, start, end)].sum(axis=1), sdm)
+        return {label[-1]: int(total) for label, total in zip(labels, sums)}
+
+    def missing_total(self, date=None, start=None, end=None, sdm=None, smo=None):
+        return int(self.missing[self._rows(sdm, smo), self._columns(date, start, end)].sum())
+
+    def missing_vles(self, date, sdm=None, smo=None):
+        # VLEs that did not fill the form on `date`
+        column = self._columns(date)
+        if column.stop - column.start != 1:
+            return self.vles.iloc[0:0]
+        rows = self._rows(sdm, smo) & self.missing[:, column.start]
+        return self.vles[rows].reset_index(drop=True)
+
+    def current_streaks(self, end=None):
+        # Consecutive days each VLE has missed, counting back from `end`
+        # (default: the latest date)
+        window = self.missing[:, self._columns(end=end)]
+        days = window.shape[1]
+        if days == 0:
+            return np.zeros(len(self.vles), dtype=np.int64)
+        # Distance from the end to the last day that was not missed
+        not_missing = ~window[:, ::-1]
+        return np.where(not_missing.any(axis=1), np.argmax(not_missing, axis=1), days).astype(np.int64)
+
+    def longest_streaks(self, start=None, end=None):
+        # Longest run of consecutive missed days per VLE within a range
+        window = self.missing[:, self._columns(start=start, end=end)]
+        longest = np.zeros(len(self.vles), dtype=np.int64)
+        run = np.zeros(len(self.vles), dtype=np.int64)
+        for day in range(window.shape[1]):
+            run = np.where(window[:, day], run + 1, 0)
+            np.maximum(longest, run, out=longest)
+        return longest
+
+    def streak_vles(self, min_days, end=None, sdm=None, smo=None):
+        # VLEs who have missed at least `min_days` days in a row up to `end`
+        streaks = self.current_streaks(end)
+        rows = self._rows(sdm, smo) & (streaks >= min_days)
+        result = self.vles[rows].assign(**{'Days Missed': streaks[rows]})
+        return result.sort_values('Days Missed', ascending=False, kind='stable').reset_index(drop=True)
+
+    def heatmap(self, level="smo", start=None, end=None, sdm=None):
+        # Share of VLEs that missed the form per SDM / SMO (rows) and date
+        # (columns); NaN where the group has no rows for that date
+        columns = self._columns(start=start, end=end)
+        missing = self.missing[:, columns]
+        labels, missed = self._group_sums(level, missing, sdm)
+        _, reported = self._group_sums(level, missing | self.filled[:, columns], sdm)
+        share = np.where(reported > 0, missed / np.maximum(reported, 1), np.nan)
+        index = pd.Index([" / ".join(map(str, label)) for label in labels])
+        return pd.DataFrame(share, index=index, columns=self.dates[columns])
+
+
+def put_compliance(df, matrix):
+    frame_cache.put("compliance", df, matrix)
+
+
+def get_compliance(df):
+    # One ComplianceMatrix per processed frame (see frame_cache)
+    cached = frame_cache.get("compliance", df)
+    if cached is not None:
+        REGISTRY.cache("compliance", True)
+        return cached
+    REGISTRY.cache("compliance", False)
+    with REGISTRY.timer("build", "compliance"):
+        matrix = ComplianceMatrix(df)
+    put_compliance(df, matrix)
+    return matrix
@@ -1,7 +1,64 @@
+import os
+
+# District served by SHEET_ID / SDM_MAPPING below when no district configs exist
+DISTRICT_NAME = "Ludhiana"
+
+# JSON district config file, or a directory of them (see districts.py)
+DISTRICTS_PATH = os.environ.get(
+    "DISTRICTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "districts"))
 
 SHEET_ID = "179_3BEpwPIt1kSFgQYb5SzdxkmNYVQpsyFNFN38_l-E"
 BASE_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=csv&gid="
 
+# Parallel fetch settings
+FETCH_MAX_WORKERS = 8        # Concurrent sheet downloads
+FETCH_SHEET_TIMEOUT = 10     # Seconds allowed per sheet
+FETCH_OVERALL_TIMEOUT = 30   # Seconds allowed for a full refresh
+
+# Transient failures (timeouts, connection errors, 429 / 5xx) are retried
+# with jittered exponential backoff within the refresh deadline. After
+# BREAKER_THRESHOLD failed refreshes in a row a sheet is not requested
+# again for BREAKER_COOLDOWN seconds; its last good copy is served meanwhile.
+FETCH_RETRIES = 2            # Extra attempts per sheet
+FETCH_BACKOFF_BASE = 0.5     # Seconds before the first retry (upper bound)
+FETCH_BACKOFF_MAX = 8        # Cap on a single backoff
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 300
+
+# How a refresh downloads a spreadsheet: "tabs" makes one CSV request per
+# SMO tab, "workbook" one xlsx export of the whole spreadsheet (needs
+# openpyxl). Districts can override it with "ingest_mode".
+INGEST_MODE = "tabs"
+
+# Re-parse only the newest days of sheets already loaded
+STREAM_INGEST = True
+STREAM_LOOKBACK_DAYS = 1   # Days before the newest stored date to re-read
+
+# Store identity columns as categoricals and counts as small nullable ints
+COMPACT_FRAMES = True
+
+# Background refresh schedule, in seconds
+REFRESH_INTERVAL = 300
+
+# Apply cell-level edits to the published dataset instead of rebuilding it,
+# and keep this many of the newest edits for the "Recent Updates" feed
+DELTA_UPDATES = True
+UPDATES_FEED_SIZE = 200
+
+# Timeline charts: points per series before switching to a coarser
+# bucket (day -> week -> month), and series before the rest become "Others"
+TIMELINE_MAX_POINTS = 120
+TIMELINE_MAX_SERIES = 12
+
+# Open the app with ?diagnostics=<token> to show the timing / cache panel;
+# the panel is off unless the DIAGNOSTICS_TOKEN environment variable is set
+DIAGNOSTICS_TOKEN = os.environ.get("DIAGNOSTICS_TOKEN") or None
+
+# On-disk snapshot of the processed sheets
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots")
+SNAPSHOT_MAX_AGE = 300         # Older than this: serve it, refresh in the background
+SNAPSHOT_HARD_MAX_AGE = 86400  # Older than this: too stale to show, refresh first
+
 SDM_MAPPING = {
     "SDM JAGRAON": [
         {"smo_name": "Dr gurbinder", "gid": "1247592058"},
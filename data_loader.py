@@ -1,74 +1,447 @@
 
+import hashlib
+import numpy as np
 import pandas as pd
-import requests
-from io import StringIO
-from datetime import datetime
-import streamlit as st
-from data_config import BASE_URL, SDM_MAPPING
-
-@st.cache_data(ttl=300)  # Cache data for 5 minutes
-def fetch_sheet_data(gid):
-    url = f"{BASE_URL}{gid}"
+import threading
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+from data_config import (
+    BASE_URL, SDM_MAPPING, SNAPSHOT_DIR, SNAPSHOT_MAX_AGE, SNAPSHOT_HARD_MAX_AGE, COMPACT_FRAMES,
+    STREAM_INGEST, STREAM_LOOKBACK_DAYS, INGEST_MODE, DELTA_UPDATES, FETCH_OVERALL_TIMEOUT
+)
+from deltas import diff_slices, is_structural
+from fetch_engine import (
+    BREAKER, STATUS_SKIPPED, SheetResult, fetch_sheets, fetch_workbook, is_transient, retry
+)
+from metrics import REGISTRY, sheet_key
+from sheet_store import SheetState, SheetStore
+from snapshot_store import load_snapshot, save_snapshot, snapshot_age
+from grouping import week_keys
+
+# How far ahead of today a "DD Mon" header may be before it is read as last year's
+MAX_FUTURE_DAYS = 31
+
+# Columns of the wide sheet that describe the VLE rather than a day
+STATIC_COLS = ['Sr No', 'CSC ID', 'VLE Name', 'VLE Contact Number', 'SMO', 'SMO Name', 'SDM']
+
+# Columns process_data adds per (VLE, date) row; everything else identifies the VLE
+VALUE_COLS = ('Date_Str', 'Cards Issued', 'Date', 'Week')
+
+# Repeated on every row of a VLE; stored as categoricals in compact mode
+IDENTITY_COLS = ['SDM', 'SMO Name', 'SMO', 'VLE Name', 'VLE Contact Number', 'CSC ID']
+
+# Last processed copy of every sheet, shared by all sessions in the process
+SHEET_STORE = SheetStore()
+
+def parse_date(date_str, today=None):
+    # Headers are "DD Mon" with no year. Use the current year unless that
+    # puts the date more than MAX_FUTURE_DAYS ahead, in which case the
+    # column is from last year (e.g. "28 Dec" read in early January).
+    # Only right for a single header; a sheet's headers go through
+    # parse_date_headers, which also uses the column order.
+    today = today or datetime.now()
+    day_month = _day_month(date_str)
+    if day_month is None:
+        return None
+    for year in (today.year, today.year - 1):
+        dt = _in_year(day_month, year)
+        if dt is not None and dt <= today + timedelta(days=MAX_FUTURE_DAYS):
+            return dt
+    return None
+
+def _day_month(date_str):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        csv_data = StringIO(response.text)
-        df = pd.read_csv(csv_data)
-        return df
-    except Exception as e:
-        print(f"Error fetching GID {gid}: {e}")
-        return pd.DataFrame()
-
-def parse_date(date_str):
+        # 2000 is a leap year, so "29 Feb" parses here
+        return datetime.strptime(f"{date_str} 2000", "%d %b %Y")
+    except (ValueError, TypeError):
+        return None
+
+def _in_year(day_month, year):
     try:
-        # Assuming format "26 Jan" and current year 2025
-        # We need to handle the year dynamically if possible, or just assume 2025
-        # Since the prompt implies recent data, 2025 is a safe bet for Jan/Feb dates.
-        current_year = datetime.now().year
-        # If we are in early 2025 and data is "Dec", it might be 2024. 
-        # But for now, let's keep it simple.
-        dt = datetime.strptime(f"{date_str} {current_year}", "%d %b %Y")
-        return dt
-    except ValueError:
+        return day_month.replace(year=year)
+    except ValueError:  # 29 Feb outside a leap year
         return None
 
-def fetch_all_data():
-    all_dfs = []
-    
-    for sdm_name, smos in SDM_MAPPING.items():
+def parse_date_headers(headers, today=None):
+    # Parse each distinct header once: header -> datetime (or None).
+    # The newest (rightmost) dated column gets its year from parse_date;
+    # walking left, a column that would fall more than MAX_FUTURE_DAYS
+    # after the oldest date so far is from the year before. This covers a
+    # full year of daily columns (parse_date alone only ~11 months) and
+    # columns up to MAX_FUTURE_DAYS out of order.
+    today = today or datetime.now()
+    unique = list(pd.unique(pd.Series(headers, dtype=object)))
+    dates = dict.fromkeys(unique)
+    oldest = None
+    for header in reversed(unique):
+        day_month = _day_month(header)
+        if day_month is None:
+            continue
+        if oldest is None:
+            date = parse_date(header, today)
+        else:
+            date = _in_year(day_month, oldest.year)
+            if date is None or date > oldest + timedelta(days=MAX_FUTURE_DAYS):
+                date = _in_year(day_month, oldest.year - 1)
+        if date is not None:
+            dates[header] = date
+            oldest = date if oldest is None else min(oldest, date)
+    return dates
+
+def fetch_all_data_with_status(base_url=BASE_URL, sdm_mapping=SDM_MAPPING, store=None,
+                               ingest_mode=INGEST_MODE):
+    # Returns the processed frame plus the per-GID SheetResult map so the
+    # caller can tell which SMOs are missing from a partial load.
+    # Sheets that failed keep their last good copy from the store (see
+    # sheet_health for which ones are stale).
+    store = store if store is not None else SHEET_STORE
+    results = refresh_sheets(store, base_url, sdm_mapping, ingest_mode)
+    return combine_sheets(store, sdm_mapping), results
+
+def load_dataset(max_age=SNAPSHOT_MAX_AGE, hard_max_age=SNAPSHOT_HARD_MAX_AGE,
+                 snapshot_dir=SNAPSHOT_DIR, base_url=BASE_URL, sdm_mapping=SDM_MAPPING, store=None,
+                 ingest_mode=INGEST_MODE):
+    # Serve the processed dataset without waiting on the network whenever
+    # possible. The on-disk snapshot is read once per store; data older
+    # than `max_age` is still served while a background refresh runs, data
+    # older than `hard_max_age` (or no data at all) is refreshed first.
+    store = store if store is not None else SHEET_STORE
+    with store.refresh_lock:
+        if not store.snapshot_loaded:
+            load_snapshot(store, snapshot_dir)
+            store.snapshot_loaded = True
+
+    age = snapshot_age(store)
+    if age is None or age > hard_max_age:
+        refresh_and_save(store, snapshot_dir, base_url, sdm_mapping, ingest_mode)
+    elif age > max_age:
+        start_background_refresh(store, snapshot_dir, base_url, sdm_mapping, ingest_mode)
+    return combine_sheets(store, sdm_mapping)
+
+def refresh_and_save(store, snapshot_dir=SNAPSHOT_DIR, base_url=BASE_URL, sdm_mapping=SDM_MAPPING,
+                     ingest_mode=INGEST_MODE):
+    # Only one refresh per store at a time; callers that lose the race
+    # wait for the winner and use what it produced.
+    if not store.refresh_lock.acquire(blocking=False):
+        with store.refresh_lock:
+            return None
+    try:
+        results = refresh_sheets(store, base_url, sdm_mapping, ingest_mode)
+        changed = {gid for gid, result in results.items() if result.ok}
+        save_snapshot(store, snapshot_dir, gids=changed)
+        return results
+    finally:
+        store.refresh_lock.release()
+
+def start_background_refresh(store, snapshot_dir=SNAPSHOT_DIR, base_url=BASE_URL, sdm_mapping=SDM_MAPPING,
+                             ingest_mode=INGEST_MODE):
+    if store.refresh_lock.locked():
+        return None
+    thread = threading.Thread(
+        target=refresh_and_save, args=(store, snapshot_dir, base_url, sdm_mapping, ingest_mode),
+        name="sheet-refresh", daemon=True,
+    )
+    thread.start()
+    return thread
+
+def build_sheet_slice(df, sdm_name, smo_name, today=None):
+    # SDM from the mapping; SMO Name from the mapping if the sheet lacks it.
+    # Added with one concat: a parsed wide sheet holds a block per column,
+    # and inserting columns one by one fragments it further.
+    added = {'SDM': sdm_name}
+    if 'SMO Name' not in df.columns:
+        added['SMO Name'] = smo_name
+    df = pd.concat([df.drop(columns=['SDM'], errors='ignore'), pd.DataFrame(added, index=df.index)], axis=1)
+    return process_data(df, today)
+
+def static_digest(wide):
+    # Fingerprint of the VLE rows of a wide sheet (static columns only).
+    # A streamed partial parse may only extend the stored slice while this
+    # is unchanged.
+    cols = [c for c in STATIC_COLS if c in wide.columns]
+    hashed = pd.util.hash_pandas_object(wide[cols], index=False).to_numpy()
+    return hashlib.sha256(",".join(cols).encode() + hashed.tobytes()).hexdigest()
+
+def stream_since(state):
+    # First date to re-parse for a stored sheet: its newest date minus a
+    # short look-back, so late edits to the last few days are still seen.
+    # None means a full parse is needed.
+    if state is None or state.static_digest is None or state.frame.empty:
+        return None
+    high_water = state.frame['Date'].max()
+    if pd.isna(high_water):
+        return None
+    return high_water - timedelta(days=STREAM_LOOKBACK_DAYS)
+
+def incremental_columns(since, today=None):
+    # read_csv usecols predicate: static columns plus days from `since` on
+    today = today or datetime.now()
+    def usecols(col):
+        if col in STATIC_COLS:
+            return True
+        date = parse_date(col, today)
+        return date is not None and date >= since
+    return usecols
+
+def ingest_sheet(gid, result, previous, sdm_name, smo_name):
+    # Turn a fetched sheet into its new SheetState. A partial result only
+    # holds the recent days: those rows replace the same days in the stored
+    # slice. If the VLE rows themselves changed, parse the full body.
+    # The cell changes against `previous` are kept on the state, compared
+    # over the re-parsed days only when streaming.
+    wide = result.df
+    frame = None
+    since = None
+    if result.partial:
+        digest = static_digest(wide)
+        if previous is not None and digest == previous.static_digest:
+            since = stream_since(previous)
+            recent = build_sheet_slice(wide, sdm_name, smo_name)
+            # The column filter reads each header on its own, so it also
+            # lets through last year's columns that parse as the coming
+            # month; process_data dates them by column order
+            recent = recent[recent['Date'] >= since]
+            kept = previous.frame[previous.frame['Date'] < since]
+            frame = pd.concat([kept, recent], ignore_index=True)
+            if COMPACT_FRAMES:
+                frame = compact_frame(frame)
+        else:
+            wide = pd.read_csv(BytesIO(result.body))
+    if frame is None:
+        digest = static_digest(wide)
+        frame = build_sheet_slice(wide, sdm_name, smo_name)
+    changes = None
+    if DELTA_UPDATES and previous is not None and not previous.frame.empty and not frame.empty:
+        with REGISTRY.timer("ingest", "diff"):
+            changes = diff_slices(previous.frame, frame, since)
+    return SheetState(
+        gid, sdm_name, smo_name, frame,
+        etag=result.etag, last_modified=result.last_modified,
+        digest=result.digest, fetched_at=time.time(), static_digest=digest,
+        changes=changes, base_digest=previous.digest if changes is not None else None,
+    )
+
+def refresh_sheets(store, base_url=BASE_URL, sdm_mapping=SDM_MAPPING, ingest_mode=INGEST_MODE):
+    # Incremental refresh: conditional requests for every tab, but only
+    # the tabs whose bytes changed are parsed and run through process_data.
+    # Tabs already in the store are streamed and only their newest days
+    # parsed, so the cost follows the number of new days, not the history.
+    # In "workbook" mode the whole spreadsheet comes in one xlsx download
+    # and is split into tabs by title ("sheet" in the mapping, else the
+    # SMO name); changed tabs then go through the same ingest below.
+    gids = [smo_info["gid"] for smos in sdm_mapping.values() for smo_info in smos]
+    states = store.snapshot()
+    if ingest_mode == "workbook":
+        # Tabs whose breaker is open are left out and keep their stored copy
+        tabs, results = {}, {}
+        for smos in sdm_mapping.values():
+            for smo_info in smos:
+                gid = smo_info["gid"]
+                key = sheet_key(gid, base_url)
+                if BREAKER.allow(key):
+                    tabs[gid] = smo_info.get("sheet", smo_info["smo_name"])
+                else:
+                    failures = BREAKER.health(key)["failures"]
+                    results[gid] = SheetResult(gid, STATUS_SKIPPED, error=f"circuit open after {failures} failures",
+                                               attempts=0)
+        if tabs:
+            # The workbook digest only vouches for the tabs parsed with it,
+            # so it is not kept (or used) while some tabs are skipped
+            previous_digest = store.workbook_digest if not results else None
+            (fetched, digest), attempts = retry(
+                lambda: fetch_workbook(tabs, base_url=base_url, previous=states, previous_digest=previous_digest),
+                lambda attempt: all(is_transient(result) for result in attempt[0].values()),
+                deadline=time.monotonic() + FETCH_OVERALL_TIMEOUT,
+            )
+            store.workbook_digest = digest if not results else None
+            for gid, result in fetched.items():
+                result.attempts = attempts
+                BREAKER.record(sheet_key(gid, base_url), result)
+            results.update(fetched)
+    else:
+        usecols = {}
+        if STREAM_INGEST:
+            for gid in gids:
+                since = stream_since(states.get(gid))
+                if since is not None:
+                    usecols[gid] = incremental_columns(since)
+        results = fetch_sheets(gids, base_url=base_url, previous=states, usecols=usecols)
+
+    for sdm_name, smos in sdm_mapping.items():
         for smo_info in smos:
-            smo_name = smo_info["smo_name"]
             gid = smo_info["gid"]
-            
-            df = fetch_sheet_data(gid)
-            if not df.empty:
-                # Ensure we have the SDM column
-                df['SDM'] = sdm_name
-                # Ensure we have the SMO column from config if missing or normalize it
-                if 'SMO Name' not in df.columns:
-                     df['SMO Name'] = smo_name
-                
-                all_dfs.append(df)
-    
-    if not all_dfs:
-        return pd.DataFrame()
-    
-    combined_df = pd.concat(all_dfs, ignore_index=True)
-    return process_data(combined_df)
+            result = results[gid]
+            if result.ok:
+                with REGISTRY.timer("ingest", gid):
+                    state = ingest_sheet(gid, result, states.get(gid), sdm_name, smo_info["smo_name"])
+                store.put(state)
+                REGISTRY.update_sheet(gid, base_url, sdm=sdm_name, smo=smo_info["smo_name"], rows=len(state.frame))
+            elif result.succeeded:
+                store.touch(gid, result)
+            else:
+                fallback = "serving last good copy" if store.get(gid) is not None else "no data yet"
+                print(f"Error fetching GID {gid} ({result.status}, {fallback}): {result.error}")
+    return results
+
+def sheet_health(store, sdm_mapping=SDM_MAPPING, base_url=BASE_URL, breaker=BREAKER):
+    # Per-sheet health for the dashboards: breaker state and failure count,
+    # when the sheet last loaded, and whether the copy being served is
+    # stale (its latest fetches failed) or missing altogether.
+    health = {}
+    for sdm_name, smos in sdm_mapping.items():
+        for smo_info in smos:
+            gid = smo_info["gid"]
+            state = store.get(gid)
+            record = breaker.health(sheet_key(gid, base_url))
+            health[gid] = {
+                'sdm': sdm_name,
+                'smo_name': smo_info["smo_name"],
+                'breaker': record['state'],
+                'failures': record['failures'],
+                'last_error': record['last_error'],
+                'loaded_at': state.fetched_at if state is not None else None,
+                'stale': state is not None and record['failures'] > 0,
+                'missing': state is None or state.frame.empty,
+            }
+    return health
+
+def combine_sheets(store, sdm_mapping):
+    # Stitch the per-sheet slices back into one long frame. The result is
+    # reused as long as no sheet produced a new slice, so a sheet that
+    # fails to fetch keeps its last good slice without a rebuild.
+    states = []
+    for smos in sdm_mapping.values():
+        for smo_info in smos:
+            state = store.get(smo_info["gid"])
+            if state is not None and not state.frame.empty:
+                states.append(state)
+
+    key = tuple((state.gid, state.digest) for state in states)
+    cached = store.cached_combined(key)
+    REGISTRY.cache("combined", cached is not None)
+    if cached is not None:
+        return cached
 
-def process_data(df):
+    if DELTA_UPDATES:
+        with REGISTRY.timer("combine", "patch"):
+            patched = patch_combined(store, states, key)
+        if patched is not None:
+            return patched
+
+    layout = {}
+    if not states:
+        combined_df = pd.DataFrame()
+    else:
+        with REGISTRY.timer("combine", "concat"):
+            blocks = align_dates([state.frame for state in states])
+            combined_df = pd.concat(blocks, ignore_index=True)
+        start = 0
+        for state, block in zip(states, blocks):
+            layout[state.gid] = (start, len(state.frame))
+            start += len(block)
+        if COMPACT_FRAMES:
+            # Slices have their own categories, so concat falls back to object
+            with REGISTRY.timer("combine", "compact"):
+                combined_df = compact_frame(combined_df)
+    store.set_combined(key, combined_df, layout)
+    return combined_df
+
+def patch_combined(store, states, key):
+    # When every changed sheet only had cell values edited (same VLE rows
+    # and dates in the same order, so the same row layout), copy the last combined frame and
+    # overwrite just those sheets' counts instead of concatenating all
+    # sheets again. Returns None when a full rebuild is needed.
+    previous_key, previous_df, layout = store.combined()
+    if previous_df is None or previous_df.empty or [g for g, _ in previous_key] != [g for g, _ in key]:
+        return None
+    previous_digests = dict(previous_key)
+    changed = [state for state in states if state.digest != previous_digests[state.gid]]
+    for state in changed:
+        if (state.changes is None or state.base_digest != previous_digests[state.gid]
+                or is_structural(state.changes) or layout.get(state.gid, (0, -1))[1] != len(state.frame)
+                or not same_rows(previous_df, layout[state.gid], state.frame)):
+            return None
+
+    values = previous_df['Cards Issued'].array.copy()
+    try:
+        for state in changed:
+            start, rows = layout[state.gid]
+            values[start:start + rows] = state.frame['Cards Issued'].to_numpy(dtype='float64', na_value=np.nan)
+    except (TypeError, ValueError):  # e.g. a count too large for the compact dtype
+        return None
+    combined_df = previous_df.copy(deep=False)
+    combined_df['Cards Issued'] = values
+    changes = pd.concat([state.changes for state in changed], ignore_index=True) if changed else None
+    store.set_combined(key, combined_df, layout, patched_from=previous_df, changes=changes)
+    return combined_df
+
+def same_rows(combined_df, block, frame):
+    # Whether the combined frame's rows start..start+rows hold `frame`'s
+    # rows in the same order (all but the counts). The cell changes are
+    # matched by key, so reordered VLE rows or date columns show no change
+    # there but would put the counts on the wrong rows.
+    start, rows = block
+    cols = [c for c in frame.columns if c != 'Cards Issued']
+    if any(c not in combined_df.columns for c in cols):
+        return False
+    old = combined_df[cols].iloc[start:start + rows].astype(object).reset_index(drop=True)
+    return old.equals(frame[cols].astype(object).reset_index(drop=True))
+
+def align_dates(slices):
+    # Sheets that lack a date column another sheet has still need rows for
+    # that date (counted as missing forms), as if the wide sheets had been
+    # concatenated before melting.
+    all_dates = pd.unique(pd.concat([pd.Series(frame['Date'].unique()) for frame in slices]))
+    aligned = []
+    for frame in slices:
+        present = set(frame['Date'].unique())
+        missing = [d for d in all_dates if d not in present]
+        if missing:
+            id_cols = [c for c in frame.columns if c not in VALUE_COLS]
+            vles = frame[id_cols].drop_duplicates()
+            filler = vles.merge(pd.DataFrame({'Date': pd.DatetimeIndex(missing)}), how='cross')
+            filler['Cards Issued'] = pd.Series(pd.NA, index=filler.index, dtype=frame['Cards Issued'].dtype)
+            filler['Week'] = week_keys(filler['Date'])
+            if 'Date_Str' in frame.columns:
+                filler['Date_Str'] = filler['Date'].dt.strftime("%d %b")
+            frame = pd.concat([frame, filler[frame.columns]], ignore_index=True)
+        aligned.append(frame)
+    return aligned
+
+def compact_frame(df):
+    # Compact storage for the long frame: identity strings that repeat on
+    # every (VLE, day) row become categoricals, counts the smallest
+    # nullable integer that holds them, and Date_Str goes (Date has it).
+    df = df.drop(columns=['Date_Str'], errors='ignore')
+    for col in IDENTITY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    df['Cards Issued'] = compact_counts(df['Cards Issued'])
+    return df
+
+def compact_counts(values):
+    # Int16 / Int32 when every filled value is a whole number in range,
+    # otherwise leave the column as it is
+    filled = values.dropna()
+    if filled.empty or (filled % 1 == 0).all():
+        for dtype, limit in (('Int16', 2 ** 15), ('Int32', 2 ** 31)):
+            if filled.empty or filled.abs().max() < limit:
+                return values.astype(dtype)
+    return values
+
+def process_data(df, today=None, compact=COMPACT_FRAMES):
     # Identify static columns
-    static_cols = ['Sr No', 'CSC ID', 'VLE Name', 'VLE Contact Number', 'SMO', 'SMO Name', 'SDM']
+    static_cols = STATIC_COLS
     
     # Identify date columns (columns that are not static)
     date_cols = [c for c in df.columns if c not in static_cols]
     
-    # Filter out columns that might be junk (unnamed, empty)
-    valid_date_cols = []
-    for col in date_cols:
-        # check if it looks like a date "DD Mon"
-        if parse_date(col):
-            valid_date_cols.append(col)
+    # Filter out columns that might be junk (unnamed, empty):
+    # keep the ones that look like a date "DD Mon"
+    with REGISTRY.timer("process_data", "headers"):
+        date_lookup = parse_date_headers(date_cols, today)
+    valid_date_cols = [c for c in date_cols if date_lookup[c] is not None]
             
     # Melt the dataframe
     # We want: SDM, SMO Name, VLE Name, VLE Contact Number, Date, Count
@@ -77,18 +450,27 @@ def process_data(df):
     cols_to_keep = [c for c in static_cols if c in df.columns] + valid_date_cols
     df = df[cols_to_keep]
     
-    melted_df = df.melt(
-        id_vars=[c for c in cols_to_keep if c in static_cols],
-        value_vars=valid_date_cols,
-        var_name='Date_Str',
-        value_name='Cards Issued'
-    )
+    with REGISTRY.timer("process_data", "melt"):
+        melted_df = df.melt(
+            id_vars=[c for c in cols_to_keep if c in static_cols],
+            value_vars=valid_date_cols,
+            var_name='Date_Str',
+            value_name='Cards Issued'
+        )
     
-    # Convert Date_Str to datetime
-    melted_df['Date'] = melted_df['Date_Str'].apply(parse_date)
+    # Convert Date_Str to datetime: one parse per header, then a
+    # categorical code lookup instead of a strptime per row
+    with REGISTRY.timer("process_data", "dates"):
+        melted_df['Date_Str'] = pd.Categorical(melted_df['Date_Str'], categories=valid_date_cols)
+        header_dates = pd.DatetimeIndex([date_lookup[c] for c in valid_date_cols])
+        codes = melted_df['Date_Str'].cat.codes.to_numpy()
+        melted_df['Date'] = header_dates.take(codes)
+        # Integer week key (202504 for "2025-W04"), computed per header too
+        melted_df['Week'] = week_keys(header_dates).take(codes)
     
     # Convert Cards Issued to numeric (coerce errors to NaN)
-    melted_df['Cards Issued'] = pd.to_numeric(melted_df['Cards Issued'], errors='coerce')
+    with REGISTRY.timer("process_data", "numeric"):
+        melted_df['Cards Issued'] = pd.to_numeric(melted_df['Cards Issued'], errors='coerce')
     
     # "Filled Form" Logic:
     # If 'Cards Issued' is NaN, it means they didn't fill the form (according to prompt interpretation).
@@ -97,5 +479,8 @@ def process_data(df):
     # If the user says "how many vle doesnt fill the form", and the sheet has NaNs for empty cells, 
     # then NaN = Not Filled.
     
+    if compact:
+        with REGISTRY.timer("process_data", "compact"):
+            melted_df = compact_frame(melted_df)
     return melted_df
 
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from data_config import UPDATES_FEED_SIZE
+
+# Columns identifying one (VLE, date) cell of a sheet slice
+CELL_KEYS = ['SDM', 'SMO Name', 'VLE Name', 'VLE Contact Number', 'CSC ID', 'Date']
+
+# Kinds of change; "added" / "removed" mean the cell itself appeared or
+# disappeared (a new day, a VLE row added or deleted), which changes the
+# shape of the data rather than just a value
+FILLED, UPDATED, CLEARED, ADDED, REMOVED = "filled", "updated", "cleared", "added", "removed"
+STRUCTURAL = (ADDED, REMOVED)
+
+FEED_COLUMNS = ['Detected', 'SDM', 'SMO Name', 'VLE Name', 'Date', 'Old', 'New', 'Change']
+
+
+def diff_slices(old, new, since=None):
+    # Cell-level changes between two versions of one sheet slice, as rows
+    # of the cell keys (and `_n`, the cell's ordinal among rows repeating
+    # those keys) plus Old / New counts and the kind of change. With
+    # `since`, only cells dated on or after it are compared (the part a
+    # streamed refresh re-parsed).
+    keys = [c for c in CELL_KEYS if c in old.columns and c in new.columns]
+    if since is not None:
+        old = old[old['Date'] >= since]
+        new = new[new['Date'] >= since]
+    left, right = _cells(old, keys, 'Old'), _cells(new, keys, 'New')
+    merged = left.merge(right, on=keys + ['_n'], how='outer', indicator=True)
+
+    side = merged['_merge'].to_numpy()
+    old_filled = merged['Old'].notna().to_numpy()
+    new_filled = merged['New'].notna().to_numpy()
+    same = (old_filled == new_filled) & (merged['Old'].fillna(0) == merged['New'].fillna(0)).to_numpy()
+    kind = np.select(
+        [side == 'right_only', side == 'left_only', ~old_filled & new_filled, old_filled & ~new_filled],
+        [ADDED, REMOVED, FILLED, CLEARED],
+        default=UPDATED,
+    )
+    changed = ~((side == 'both') & same)
+    result = merged.loc[changed, keys + ['_n', 'Old', 'New']].assign(Change=kind[changed])
+    result['Date'] = pd.to_datetime(result['Date'])
+    return result.reset_index(drop=True)
+
+
+def _cells(frame, keys, value_name):
+    # Plain key values for the join (the slices may have different
+    # categories), numbered within repeated keys such as blank VLE rows
+    cells = frame[keys].astype(object)
+    cells['_n'] = cells.groupby(keys, dropna=False, sort=False).cumcount()
+    cells[value_name] = frame['Cards Issued'].astype('Float64')
+    return cells
+
+
+def is_structural(changes):
+    return bool(changes['Change'].isin(STRUCTURAL).any())
+
+
+def value_deltas(changes):
+    # Per-cell deltas of the rollup metrics for value-only changes
+    old, new = changes['Old'], changes['New']
+    filled = new.notna().astype('int64') - old.notna().astype('int64')
+    return changes.assign(**{
+        'Cards Issued': (new.fillna(0) - old.fillna(0)).astype('float64'),
+        'Filled': filled,
+        'Missing': -filled,
+    })
+
+
+def feed_entries(changes, detected_at):
+    # Changes worth showing to operators: values entered, edited or
+    # cleared, including newly added cells that already hold a value
+    visible = changes[(changes['Change'] != ADDED) | changes['New'].notna()]
+    visible = visible[visible['Change'] != REMOVED]
+    entries = visible.assign(Detected=pd.Timestamp.fromtimestamp(detected_at).floor('s'))
+    entries.loc[entries['Change'] == ADDED, 'Change'] = FILLED
+    return entries.reindex(columns=FEED_COLUMNS)
+
+
+def extend_feed(feed, entries, limit=UPDATES_FEED_SIZE):
+    # Newest first, at most `limit` rows
+    if entries is None or entries.empty:
+        return feed if feed is not None else pd.DataFrame(columns=FEED_COLUMNS)
+    parts = [entries.sort_values(['Date', 'SDM', 'SMO Name', 'VLE Name'], ascending=False, kind='stable')]
+    if feed is not None and not feed.empty:
+        parts.append(feed)
+    return pd.concat(parts, ignore_index=True).head(limit)
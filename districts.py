@@ -0,0 +1,74 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+
+from data_config import DISTRICT_NAME, DISTRICTS_PATH, INGEST_MODE, SDM_MAPPING, SHEET_ID, SNAPSHOT_DIR
+
+EXPORT_URL = "https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid="
+
+
+def slugify(name, default="district"):
+    # File-system friendly form of a district / SDM / SMO name
+    return re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-") or default
+
+
+@dataclass(frozen=True)
+class District:
+    # One district: its spreadsheet and the SDM -> SMO tabs inside it.
+    # Every district is fetched, stored and snapshotted on its own.
+    name: str
+    sheet_id: str
+    sdm_mapping: dict
+    export_url: str = None  # Overrides the Google export URL (mirrors, tests)
+    ingest_mode: str = INGEST_MODE  # "tabs" or "workbook", see data_config
+
+    @property
+    def base_url(self):
+        return self.export_url or EXPORT_URL.format(sheet_id=self.sheet_id)
+
+    @property
+    def slug(self):
+        return slugify(self.name)
+
+    @property
+    def snapshot_dir(self):
+        return os.path.join(SNAPSHOT_DIR, self.slug)
+
+
+def district_from_dict(data):
+    mode = data.get("ingest_mode", INGEST_MODE) if isinstance(data, dict) else None
+    if mode not in ("tabs", "workbook"):
+        raise ValueError(f"Invalid district config: unknown ingest_mode {mode!r}")
+    try:
+        return District(str(data["name"]), str(data["sheet_id"]), dict(data["sdm_mapping"]),
+                        data.get("export_url"), mode)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid district config: {e}") from e
+
+
+def load_districts(path=DISTRICTS_PATH):
+    # District configs from `path`: a JSON file holding one config or a
+    # list of them, or a directory of such files (read in name order).
+    # Without any, the single district built into data_config.
+    # Config shape: {"name": ..., "sheet_id": ..., "sdm_mapping": {...}},
+    # optionally with "export_url" and "ingest_mode"
+    files = []
+    if path and os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".json")]
+    elif path and os.path.isfile(path):
+        files = [path]
+
+    districts = {}
+    for file in files:
+        with open(file) as f:
+            data = json.load(f)
+        for entry in data if isinstance(data, list) else [data]:
+            district = district_from_dict(entry)
+            if district.name in districts:
+                raise ValueError(f"District {district.name!r} configured twice ({file})")
+            districts[district.name] = district
+
+    if not districts:
+        districts[DISTRICT_NAME] = District(DISTRICT_NAME, SHEET_ID, SDM_MAPPING)
+    return districts
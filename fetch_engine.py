@@ -0,0 +1,436 @@
+import hashlib
+import io
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import StringIO
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY, sheet_key
+from data_config import (
+    BASE_URL, FETCH_MAX_WORKERS, FETCH_SHEET_TIMEOUT, FETCH_OVERALL_TIMEOUT,
+    FETCH_RETRIES, FETCH_BACKOFF_BASE, FETCH_BACKOFF_MAX, BREAKER_THRESHOLD, BREAKER_COOLDOWN
+)
+
+# Sheet statuses reported back to the caller
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_NOT_MODIFIED = "not_modified"  # Server answered 304
+STATUS_UNCHANGED = "unchanged"        # Body hash matches the previous fetch
+STATUS_SKIPPED = "circuit_open"       # Not requested: the sheet's breaker is open
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+CHUNK_SIZE = 64 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class SheetDeadlineExceeded(Exception):
+    pass
+
+
+class StreamReader:
+    # Reads response.iter_content to the end, hashing and keeping the bytes
+    # as they arrive and enforcing the sheet deadline between chunks. The
+    # digest is known before anything is parsed, so an unchanged body is
+    # never parsed.
+
+    def __init__(self, chunks, deadline, start):
+        self._chunks = iter(chunks)
+        self._deadline = deadline
+        self._start = start
+        self._parts = []
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def _next_chunk(self):
+        for chunk in self._chunks:
+            if time.monotonic() > self._deadline:
+                raise SheetDeadlineExceeded(f"deadline exceeded after {time.monotonic() - self._start:.2f}s")
+            if chunk:
+                self.digest.update(chunk)
+                self.size += len(chunk)
+                self._parts.append(chunk)
+                return chunk
+        return b""
+
+    def drain(self):
+        while self._next_chunk():
+            pass
+
+    @property
+    def body(self):
+        return b"".join(self._parts)
+
+
+@dataclass
+class SheetResult:
+    gid: str
+    status: str
+    df: pd.DataFrame = field(default_factory=pd.DataFrame)
+    error: str = ""
+    elapsed: float = 0.0
+    bytes: int = 0
+    etag: str = None
+    last_modified: str = None
+    digest: str = None
+    # Set when only the `usecols` subset of the sheet was parsed; `body`
+    # then keeps the raw CSV in case the caller needs a full parse after all
+    partial: bool = False
+    body: bytes = None
+    # HTTP status of the last attempt (None if no response came back) and
+    # how many attempts the result took
+    http_status: int = None
+    attempts: int = 1
+
+    @property
+    def ok(self):
+        return self.status == STATUS_OK
+
+    @property
+    def succeeded(self):
+        # The sheet is reachable, whether or not its content changed
+        return self.status in (STATUS_OK, STATUS_NOT_MODIFIED, STATUS_UNCHANGED)
+
+
+def get_session(pool_size=FETCH_MAX_WORKERS):
+    # One pooled session per process so keep-alive connections to the
+    # sheets host are shared by every worker thread.
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def conditional_headers(previous):
+    # Validators from the previous fetch of the same sheet
+    headers = {}
+    if previous is not None:
+        if previous.etag:
+            headers["If-None-Match"] = previous.etag
+        if previous.last_modified:
+            headers["If-Modified-Since"] = previous.last_modified
+    return headers
+
+
+def download_sheet(gid, base_url=BASE_URL, timeout=FETCH_SHEET_TIMEOUT, deadline=None, session=None,
+                   previous=None, usecols=None):
+    # Stream the body so the deadline covers the whole download, not just
+    # the gap between two packets like the plain requests timeout does.
+    # `previous` is anything with etag / last_modified / digest attributes
+    # (a SheetResult or SheetState); when the sheet turns out to be
+    # unchanged the body is not parsed at all.
+    # With a `usecols` callable only the matching columns of a changed
+    # body are converted (a partial result).
+    session = session or get_session()
+    start = time.monotonic()
+    if deadline is None:
+        deadline = start + timeout
+    url = f"{base_url}{gid}"
+    http_status = None
+    try:
+        response = session.get(url, timeout=timeout, stream=True, headers=conditional_headers(previous))
+        http_status = response.status_code
+        with response:
+            if response.status_code == 304 and previous is not None:
+                return SheetResult(
+                    gid, STATUS_NOT_MODIFIED, elapsed=time.monotonic() - start,
+                    etag=previous.etag, last_modified=previous.last_modified, digest=previous.digest,
+                )
+            response.raise_for_status()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            encoding = response.encoding or "utf-8"
+            stream = StreamReader(response.iter_content(CHUNK_SIZE), deadline, start)
+            stream.drain()
+            body = stream.body
+        digest = stream.digest.hexdigest()
+        if previous is not None and previous.digest == digest:
+            return SheetResult(
+                gid, STATUS_UNCHANGED, elapsed=time.monotonic() - start, bytes=len(body),
+                etag=etag, last_modified=last_modified, digest=digest,
+            )
+        text = body.decode(encoding)
+        if usecols is not None:
+            partial_df = pd.read_csv(StringIO(text), usecols=usecols)
+            return SheetResult(
+                gid, STATUS_OK, partial_df, elapsed=time.monotonic() - start, bytes=len(body),
+                etag=etag, last_modified=last_modified, digest=digest, partial=True, body=body,
+            )
+        df = pd.read_csv(StringIO(text))
+        return SheetResult(
+            gid, STATUS_OK, df, elapsed=time.monotonic() - start, bytes=len(body),
+            etag=etag, last_modified=last_modified, digest=digest,
+        )
+    except (SheetDeadlineExceeded, requests.Timeout) as e:
+        return SheetResult(gid, STATUS_TIMEOUT, error=str(e), elapsed=time.monotonic() - start,
+                           http_status=http_status)
+    except Exception as e:
+        return SheetResult(gid, STATUS_ERROR, error=str(e), elapsed=time.monotonic() - start,
+                           http_status=http_status)
+
+
+def is_transient(result):
+    # Worth another attempt: timeouts, no response at all (connection
+    # errors), rate limiting and server errors. A 404 or a body that does
+    # not parse will fail the same way again.
+    if result.status == STATUS_TIMEOUT:
+        return True
+    if result.status != STATUS_ERROR:
+        return False
+    return result.http_status is None or result.http_status == 429 or result.http_status >= 500
+
+
+def backoff_delay(attempt, base=FETCH_BACKOFF_BASE, cap=FETCH_BACKOFF_MAX):
+    # Exponential backoff with full jitter: uniform over
+    # [0, min(cap, base * 2**attempt)], so sheets that failed together
+    # don't all retry at the same moment
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry(attempt, transient, retries=FETCH_RETRIES, deadline=None):
+    # Call `attempt()` until `transient(result)` is false, the retries run
+    # out or the next backoff would end past `deadline` (a monotonic time).
+    # Returns (last result, attempts made).
+    for n in range(retries + 1):
+        result = attempt()
+        if n == retries or not transient(result):
+            break
+        delay = backoff_delay(n)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            break
+        time.sleep(delay)
+    return result, n + 1
+
+
+class CircuitBreaker:
+    # Per-sheet circuit breaker and health record, keyed like the metrics
+    # registry (metrics.sheet_key). A sheet that failed `threshold` fetches
+    # in a row is "open": not requested until `cooldown` seconds have
+    # passed, then tried once ("half_open"); success closes it again,
+    # failure re-opens it for another cooldown.
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._sheets = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        return self._sheets.setdefault(key, {
+            "state": CLOSED, "failures": 0, "opened_at": None,
+            "last_error": "", "last_success": None, "last_failure": None,
+        })
+
+    def allow(self, key, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self._entry(key)
+            if entry["state"] == OPEN:
+                if now - entry["opened_at"] < self.cooldown:
+                    return False
+                entry["state"] = HALF_OPEN
+            return True
+
+    def record(self, key, result, now=None):
+        if result.status == STATUS_SKIPPED:
+            return
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self._entry(key)
+            if result.succeeded:
+                entry.update(state=CLOSED, failures=0, opened_at=None, last_success=now)
+                return
+            entry["failures"] += 1
+            entry.update(last_error=result.error, last_failure=now)
+            if entry["state"] == HALF_OPEN or entry["failures"] >= self.threshold:
+                entry.update(state=OPEN, opened_at=now)
+
+    def health(self, key):
+        with self._lock:
+            return dict(self._entry(key))
+
+    def reset(self):
+        with self._lock:
+            self._sheets.clear()
+
+
+BREAKER = CircuitBreaker()
+
+
+def workbook_url(base_url):
+    # Per-tab CSV export URL (".../export?format=csv&gid=") -> the xlsx
+    # export of the whole spreadsheet
+    return base_url.replace("format=csv&gid=", "format=xlsx")
+
+
+def frame_digest(df):
+    # Content hash of one parsed tab, standing in for the CSV body hash
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(",".join(map(str, df.columns)).encode() + hashed.tobytes()).hexdigest()
+
+
+def _header(col):
+    # Date headers typed as dates in the sheet come back as datetimes;
+    # the CSV export has them as "DD Mon" text
+    if isinstance(col, (datetime, pd.Timestamp)):
+        return col.strftime("%d %b")
+    return col
+
+
+def read_workbook(body, tabs):
+    # Split an xlsx workbook into {gid: DataFrame} using `tabs`
+    # (gid -> tab title). Tabs not found are left out.
+    excel = pd.ExcelFile(io.BytesIO(body))
+    frames = {}
+    for gid, title in tabs.items():
+        if title in excel.sheet_names:
+            df = excel.parse(title)
+            frames[gid] = df.rename(columns=_header)
+    return frames
+
+
+def fetch_workbook(tabs, base_url=BASE_URL, timeout=FETCH_OVERALL_TIMEOUT, session=None,
+                   previous=None, previous_digest=None):
+    # Whole-spreadsheet alternative to fetch_sheets: one request for every
+    # tab. `tabs` maps gid -> tab title and `previous` gid -> last known
+    # state. Returns ({gid: SheetResult}, workbook digest); when the
+    # workbook digest equals `previous_digest` nothing is parsed, otherwise
+    # only tabs whose content hash changed come back as STATUS_OK.
+    previous = previous or {}
+    session = session or get_session()
+    start = time.monotonic()
+    url = workbook_url(base_url)
+
+    def every_tab(status, error="", **fields):
+        return {gid: SheetResult(gid, status, error=error, elapsed=time.monotonic() - start, **fields)
+                for gid in tabs}
+
+    validators = next((state for state in previous.values() if state is not None and state.etag), None)
+    try:
+        response = session.get(url, timeout=timeout, stream=True, headers=conditional_headers(validators))
+        with response:
+            if response.status_code == 304 and validators is not None:
+                return every_tab(STATUS_NOT_MODIFIED, etag=validators.etag,
+                                 last_modified=validators.last_modified), previous_digest
+            response.raise_for_status()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            stream = StreamReader(response.iter_content(CHUNK_SIZE), start + timeout, start)
+            stream.drain()
+            body = stream.body
+        digest = stream.digest.hexdigest()
+        REGISTRY.update_sheet("workbook", url, status=STATUS_OK, latency=time.monotonic() - start,
+                              bytes=len(body), cache="hit" if digest == previous_digest else "miss")
+        if digest == previous_digest:
+            return every_tab(STATUS_UNCHANGED, etag=etag, last_modified=last_modified), digest
+        frames = read_workbook(body, tabs)
+    except (SheetDeadlineExceeded, requests.Timeout) as e:
+        return every_tab(STATUS_TIMEOUT, str(e)), None
+    except ImportError as e:
+        return every_tab(STATUS_ERROR, f"workbook mode needs openpyxl ({e})"), None
+    except Exception as e:
+        return every_tab(STATUS_ERROR, str(e)), None
+
+    titles = list(tabs.values())
+    results = {}
+    for gid, title in tabs.items():
+        elapsed = time.monotonic() - start
+        if titles.count(title) > 1:
+            # Two SMOs resolve to the same tab title: give them a "sheet" name
+            results[gid] = SheetResult(gid, STATUS_ERROR, error=f"tab title {title!r} is ambiguous",
+                                       elapsed=elapsed)
+            continue
+        if gid not in frames:
+            results[gid] = SheetResult(gid, STATUS_ERROR, error=f"no tab named {title!r}", elapsed=elapsed)
+            continue
+        tab_digest = frame_digest(frames[gid])
+        state = previous.get(gid)
+        status = STATUS_UNCHANGED if state is not None and state.digest == tab_digest else STATUS_OK
+        results[gid] = SheetResult(
+            gid, status, frames[gid] if status == STATUS_OK else pd.DataFrame(), elapsed=elapsed,
+            etag=etag, last_modified=last_modified, digest=tab_digest,
+        )
+    return results, digest
+
+
+def fetch_sheets(gids, base_url=BASE_URL, max_workers=FETCH_MAX_WORKERS,
+                 sheet_timeout=FETCH_SHEET_TIMEOUT, overall_timeout=FETCH_OVERALL_TIMEOUT,
+                 session=None, previous=None, usecols=None, retries=FETCH_RETRIES, breaker=BREAKER):
+    # Fetch many sheets on a bounded thread pool.
+    # Always returns one SheetResult per gid: sheets that did not finish
+    # before the overall deadline are reported as timeouts, so callers can
+    # work with whatever partial data arrived.
+    # `previous` maps gid -> last known validators for conditional requests,
+    # `usecols` maps gid -> column predicate for partial parses.
+    # Transient failures are retried (see retry); sheets whose breaker is
+    # open come back as STATUS_SKIPPED without a request.
+    previous = previous or {}
+    usecols = usecols or {}
+    gids = list(dict.fromkeys(gids))
+    if not gids:
+        return {}
+    session = session or get_session(max_workers)
+    start = time.monotonic()
+    overall_deadline = start + overall_timeout
+
+    def worker(gid):
+        def attempt():
+            sheet_deadline = min(time.monotonic() + sheet_timeout, overall_deadline)
+            return download_sheet(gid, base_url, sheet_timeout, sheet_deadline, session,
+                                  previous.get(gid), usecols.get(gid))
+        result, attempts = retry(attempt, is_transient, retries, overall_deadline)
+        result.attempts = attempts
+        return result
+
+    results = {}
+    allowed = []
+    for gid in gids:
+        if breaker.allow(sheet_key(gid, base_url)):
+            allowed.append(gid)
+        else:
+            failures = breaker.health(sheet_key(gid, base_url))["failures"]
+            results[gid] = SheetResult(gid, STATUS_SKIPPED, error=f"circuit open after {failures} failures",
+                                       attempts=0)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheet-fetch")
+    try:
+        futures = {executor.submit(worker, gid): gid for gid in allowed}
+        done, _ = wait(futures, timeout=overall_timeout)
+        for future, gid in futures.items():
+            if future in done:
+                results[gid] = future.result()
+            else:
+                results[gid] = SheetResult(
+                    gid, STATUS_TIMEOUT,
+                    error=f"overall deadline of {overall_timeout}s exceeded",
+                    elapsed=time.monotonic() - start,
+                )
+        for gid in gids:
+            key = sheet_key(gid, base_url)
+            breaker.record(key, results[gid])
+            REGISTRY.record_fetch(results[gid], base_url)
+            health = breaker.health(key)
+            REGISTRY.update_sheet(gid, base_url, attempts=results[gid].attempts,
+                                  breaker=health["state"], failures=health["failures"])
+        return {gid: results[gid] for gid in gids}
+    finally:
+        # Don't block on stragglers; they stop at their own deadline.
+        executor.shutdown(wait=False, cancel_futures=True)
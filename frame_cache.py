@@ -0,0 +1,32 @@
+import threading
+import weakref
+
+# Structures derived from a processed frame (rollups, query index,
+# compliance matrix), kept per kind for the last few frames. The loader
+# hands out the same frame object until a sheet changes, so identity is a
+# refresh key. Entries hold a weak reference to their frame: they do not
+# keep old frames alive, and a frame whose id() is reused after the old
+# one is gone never gets the old frame's entry.
+
+CACHE_SIZE = 4
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def put(kind, df, value):
+    with _lock:
+        cache = _caches.setdefault(kind, {})
+        cache.pop(id(df), None)
+        if len(cache) >= CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[id(df)] = (weakref.ref(df), value)
+
+
+def get(kind, df):
+    # The value stored for this very frame, or None
+    with _lock:
+        entry = _caches.get(kind, {}).get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    return None
@@ -0,0 +1,44 @@
+import pandas as pd
+
+# Week keys and top / bottom ranking, shared by utils, the loaders and the
+# rollups. Imports nothing else from the app, so any module can use it.
+
+
+def week_keys(dates):
+    # Vectorized integer week key, year * 100 + "%U" week number
+    # (2025-W04 -> 202504), for a Series or DatetimeIndex of dates
+    dates = pd.DatetimeIndex(dates)
+    weekday = (dates.dayofweek + 1) % 7  # Sunday = 0, as %U counts
+    week = (dates.dayofyear - 1 + 7 - weekday) // 7
+    return (dates.year * 100 + week).to_numpy()
+
+
+def week_key(date):
+    return int(week_keys([date])[0])
+
+
+def week_key_to_str(key):
+    return f"{key // 100}-W{key % 100:02d}"
+
+
+def week_str_to_key(week_str):
+    return int(week_str[:4]) * 100 + int(week_str[6:])
+
+
+def rank_groups(df, group_by_col, n=3, metric_col='Cards Issued', exclude_zero=True, keep='first'):
+    # Top-n and bottom-n groups from a single groupby, using partial
+    # selection (nlargest / nsmallest) instead of a full sort.
+    # `group_by_col` is the level to rank: 'VLE Name', 'SMO Name', 'SDM'.
+    # keep='first' / 'last' breaks ties by group order, keep='all' returns
+    # every group tied with the n-th one.
+    grouped = df.groupby(group_by_col, observed=True)[metric_col].sum()
+    top = grouped.nlargest(n, keep=keep).reset_index()
+    
+    # Filter out 0s to make the list useful (show low performers, not non-performers)
+    # Non-performers (0/NaN) are captured in "Missing Forms" or just have 0.
+    # Given the high number of NaNs/0s, showing random 0s is useless.
+    # We will show the least among those who have > 0.
+    if exclude_zero:
+        grouped = grouped[grouped > 0]
+    bottom = grouped.nsmallest(n, keep=keep).reset_index()
+    return top, bottom
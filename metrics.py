@@ -0,0 +1,106 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Recent timing events kept for the diagnostics view / JSON export
+MAX_EVENTS = 500
+
+
+def sheet_key(gid, source=None):
+    return f"{source}{gid}" if source else str(gid)
+
+
+class MetricsRegistry:
+    # In-memory, process-wide record of where time goes: timings grouped by
+    # kind ("fetch", "process_data", "section", ...) and name, the latest
+    # stats of every sheet, and hit/miss counts of the caches. Written from
+    # the refresher thread and every session, so all updates take the lock.
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._sheets = {}
+        self._caches = {}
+        self._events = deque(maxlen=max_events)
+
+    @contextmanager
+    def timer(self, kind, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(kind, name, time.perf_counter() - start)
+
+    def timed(self, kind, name):
+        # Decorator form of `timer`
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(kind, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, kind, name, seconds):
+        with self._lock:
+            stats = self._timings.setdefault(kind, {}).setdefault(
+                name, {"count": 0, "total": 0.0, "last": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["last"] = seconds
+            stats["max"] = max(stats["max"], seconds)
+            self._events.append({"at": time.time(), "kind": kind, "name": name, "seconds": seconds})
+
+    def update_sheet(self, gid, source=None, **fields):
+        # Sheets are keyed by their export URL (`source` is the base URL
+        # the gid is appended to), since gids repeat across spreadsheets
+        key = sheet_key(gid, source)
+        with self._lock:
+            self._sheets.setdefault(key, {}).update(fields, gid=str(gid), updated_at=time.time())
+
+    def record_fetch(self, result, source=None):
+        # Latency, bytes and outcome of one sheet download. A 304 or an
+        # unchanged body means the stored copy was reused: a cache hit.
+        self.observe("fetch", sheet_key(result.gid, source), result.elapsed)
+        self.update_sheet(
+            result.gid, source, status=result.status, latency=result.elapsed, bytes=result.bytes,
+            partial=result.partial, cache="hit" if result.succeeded and not result.ok else "miss",
+        )
+        if result.succeeded:
+            self.cache("sheet", not result.ok)
+
+    def cache(self, name, hit):
+        with self._lock:
+            counts = self._caches.setdefault(name, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            timings = {
+                kind: {name: dict(stats, mean=stats["total"] / stats["count"])
+                       for name, stats in names.items()}
+                for kind, names in self._timings.items()
+            }
+            return {
+                "generated_at": time.time(),
+                "timings": timings,
+                "sheets": {gid: dict(stats) for gid, stats in self._sheets.items()},
+                "caches": {name: dict(counts) for name, counts in self._caches.items()},
+                "recent": list(self._events),
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent, default=str)
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._sheets.clear()
+            self._caches.clear()
+            self._events.clear()
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,141 @@
+import copy
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import frame_cache
+from metrics import REGISTRY
+
+# Sort order of the indexed frame: every date is one contiguous block,
+# and within a date every SDM and every SMO is contiguous too.
+SORT_KEYS = ['Date', 'SDM', 'SMO Name', 'VLE Name']
+
+
+def week_bounds(week):
+    # First and last day of a "%Y-W%U" week, given as "2025-W04" or as the
+    # 202504 integer key. Week 00 and the last week are clipped to the
+    # year, as strftime numbers them.
+    if not isinstance(week, str):
+        week = f"{int(week) // 100}-W{int(week) % 100:02d}"
+    week_str = week
+    year = int(week_str[:4])
+    sunday = datetime.strptime(f"{week_str}-0", "%Y-W%U-%w")
+    start = max(sunday, datetime(year, 1, 1))
+    end = min(sunday + timedelta(days=6), datetime(year, 12, 31))
+    return pd.Timestamp(start), pd.Timestamp(end)
+
+
+def _group_positions(values):
+    # {value: sorted row positions} for one column, without a Python loop
+    # over rows
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    # NaN keys get code -1 and sort first; skip them
+    skipped = np.count_nonzero(codes < 0)
+    splits = np.split(order[skipped:], np.cumsum(counts)[:-1])
+    return dict(zip(uniques, splits))
+
+
+class DataQuery:
+    # Read-only index over the processed long frame, built once per refresh.
+    # `slice` narrows by date / week / date range with a binary search over
+    # the sorted dates and by SDM / SMO through precomputed row positions,
+    # so no selection scans the whole frame. Contiguous selections (any
+    # date or week, a date + SDM, a date + SMO) come back as row slices of
+    # the indexed frame and share its data.
+
+    def __init__(self, df):
+        if df.empty or 'Date' not in df.columns:
+            self.frame = df
+        else:
+            keys = [c for c in SORT_KEYS if c in df.columns]
+            self.frame = df.sort_values(keys, kind='stable', na_position='last')
+        self._dates = self.frame['Date'].to_numpy() if 'Date' in self.frame.columns else None
+        self._positions = {}
+        for col in ('SDM', 'SMO Name'):
+            if col in self.frame.columns:
+                self._positions[col] = _group_positions(self.frame[col])
+        if 'SDM' in self.frame.columns and 'SMO Name' in self.frame.columns:
+            pairs = pd.MultiIndex.from_arrays([self.frame['SDM'], self.frame['SMO Name']])
+            self._positions['pair'] = _group_positions(pairs)
+
+    def with_counts(self, df):
+        # Index over `df`, a copy of the indexed frame's source with only
+        # 'Cards Issued' changed (rows in the same order): reuses the sort
+        # order and row positions instead of sorting again
+        patched = copy.copy(self)
+        if not self.frame.empty:
+            frame = self.frame.copy(deep=False)
+            frame['Cards Issued'] = df['Cards Issued'].array.take(self.frame.index.to_numpy())
+            patched.frame = frame
+        return patched
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _date_range(self, start, end):
+        # Row bounds [lo, hi) of the dates start..end inclusive
+        if self._dates is None:
+            return 0, 0
+        dtype = self._dates.dtype
+        lo = np.searchsorted(self._dates, pd.Timestamp(start).to_datetime64().astype(dtype), side='left')
+        hi = np.searchsorted(self._dates, pd.Timestamp(end).to_datetime64().astype(dtype), side='right')
+        return int(lo), int(hi)
+
+    def dates(self):
+        if self._dates is None:
+            return []
+        return sorted(pd.unique(self.frame['Date'].dropna()))
+
+    def slice(self, date=None, week=None, start=None, end=None, sdm=None, smo=None):
+        if self.frame.empty:
+            return self.frame
+        lo, hi = 0, len(self.frame)
+        if date is not None:
+            lo, hi = self._date_range(date, date)
+        elif week is not None:
+            lo, hi = self._date_range(*week_bounds(week))
+        elif start is not None or end is not None:
+            lo, hi = self._date_range(
+                start if start is not None else pd.Timestamp.min,
+                end if end is not None else pd.Timestamp.max,
+            )
+
+        if sdm is None and smo is None:
+            return self.frame.iloc[lo:hi]
+
+        if sdm is not None and smo is not None:
+            positions = self._positions.get('pair', {}).get((sdm, smo))
+        elif sdm is not None:
+            positions = self._positions.get('SDM', {}).get(sdm)
+        else:
+            positions = self._positions.get('SMO Name', {}).get(smo)
+        if positions is None:
+            return self.frame.iloc[0:0]
+
+        positions = positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]
+        if len(positions) == 0:
+            return self.frame.iloc[0:0]
+        if positions[-1] - positions[0] + 1 == len(positions):
+            return self.frame.iloc[positions[0]:positions[-1] + 1]
+        return self.frame.take(positions)
+
+
+def put_query(df, query):
+    frame_cache.put("query", df, query)
+
+
+def get_query(df):
+    # One DataQuery per processed frame, reused for as long as the loader
+    # keeps handing out the same frame object (see frame_cache).
+    cached = frame_cache.get("query", df)
+    if cached is not None:
+        REGISTRY.cache("query", True)
+        return cached
+    REGISTRY.cache("query", False)
+    with REGISTRY.timer("build", "query"):
+        query = DataQuery(df)
+    put_query(df, query)
+    return query
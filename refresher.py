@@ -0,0 +1,253 @@
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+import pandas as pd
+
+from compliance import get_compliance, put_compliance
+from data_config import BASE_URL, SDM_MAPPING, SNAPSHOT_DIR, SNAPSHOT_HARD_MAX_AGE, REFRESH_INTERVAL, INGEST_MODE
+from data_loader import SHEET_STORE, combine_sheets, refresh_and_save, sheet_health
+from deltas import extend_feed, feed_entries
+from districts import load_districts
+from metrics import REGISTRY
+from query import get_query, put_query
+from rollups import StateRollups, get_rollups, put_rollups
+from sheet_store import SheetStore
+from snapshot_store import load_snapshot, snapshot_age
+from utils import memory_report
+
+_districts = None
+_refreshers = {}
+_refresher_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class DatasetVersion:
+    # One published state of the dataset. Sessions hold on to whichever
+    # version they read; the refresher only ever swaps in a new one.
+    version: int
+    df: pd.DataFrame
+    rollups: object
+    query: object
+    published_at: float
+    data_fetched_at: float = None
+    refresh_duration: float = None
+    sheet_status: dict = field(default_factory=dict)
+    memory: dict = field(default_factory=dict)
+    district: str = None
+    sdm_mapping: dict = field(default_factory=dict)
+    compliance: object = None
+    # Newest cell edits first (deltas.FEED_COLUMNS), across versions
+    updates: pd.DataFrame = None
+    # gid -> data_loader.sheet_health record at publish time
+    health: dict = field(default_factory=dict)
+
+    @property
+    def cache_key(self):
+        # Identifies this version across districts, for st.cache_data keys
+        return (self.district, self.version)
+
+    @property
+    def stale_sheets(self):
+        # Health records of the sheets served from an older copy
+        return [record for record in self.health.values() if record['stale']]
+
+    @property
+    def age(self):
+        # Seconds since the oldest sheet in this version was fetched
+        if self.data_fetched_at is None:
+            return None
+        return time.time() - self.data_fetched_at
+
+
+class BackgroundRefresher:
+    # Single worker thread per process that refreshes the sheets every
+    # `interval` seconds and publishes an immutable DatasetVersion.
+    # Readers call `current()` and never wait on the network; concurrent
+    # refresh requests collapse into the one already running. A snapshot
+    # on disk is published at start unless it is older than `hard_max_age`,
+    # in which case nothing is until the first refresh.
+
+    def __init__(self, interval=REFRESH_INTERVAL, store=None, snapshot_dir=SNAPSHOT_DIR,
+                 base_url=BASE_URL, sdm_mapping=SDM_MAPPING, district=None, ingest_mode=INGEST_MODE,
+                 hard_max_age=SNAPSHOT_HARD_MAX_AGE):
+        self.district = district
+        self.hard_max_age = hard_max_age
+        self.ingest_mode = ingest_mode
+        self.interval = interval
+        self.store = store if store is not None else SHEET_STORE
+        self.snapshot_dir = snapshot_dir
+        self.base_url = base_url
+        self.sdm_mapping = sdm_mapping
+        self._current = None
+        self._version = 0
+        self._publish_lock = threading.Lock()
+        self._published = threading.Condition(self._publish_lock)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Sheet digests behind the last published version, for the feed
+        self._feed_digests = {}
+
+    def current(self):
+        return self._current
+
+    def wait_for_version(self, timeout=None):
+        # Block until something has been published (cold start only)
+        with self._published:
+            self._published.wait_for(lambda: self._current is not None, timeout)
+        return self._current
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        with self.store.refresh_lock:
+            if not self.store.snapshot_loaded:
+                load_snapshot(self.store, self.snapshot_dir)
+                self.store.snapshot_loaded = True
+        age = snapshot_age(self.store)
+        if age is not None and age <= self.hard_max_age:
+            self._publish()
+        name = f"dataset-refresher-{self.district}" if self.district else "dataset-refresher"
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def request_refresh(self):
+        # Ask the worker to refresh now instead of at the next tick
+        self._wake.set()
+
+    def refresh_once(self):
+        start = time.monotonic()
+        results = refresh_and_save(self.store, self.snapshot_dir, self.base_url, self.sdm_mapping,
+                                   self.ingest_mode)
+        if results is None:
+            # Another refresh of the same store ran meanwhile and published
+            return self._current
+        status = {gid: result.status for gid, result in results.items()}
+        with REGISTRY.timer("refresh", "publish"):
+            version = self._publish(time.monotonic() - start, status)
+        REGISTRY.observe("refresh", "total", time.monotonic() - start)
+        return version
+
+    def _run(self):
+        while not self._stop.is_set():
+            age = snapshot_age(self.store)
+            if age is None or age >= self.interval or self._wake.is_set():
+                self._wake.clear()
+                try:
+                    self.refresh_once()
+                except Exception as e:
+                    print(f"Background refresh failed ({self.district or 'default'}): {e}")
+                wait = self.interval
+            else:
+                wait = self.interval - age
+            self._wake.wait(wait)
+
+    def _publish(self, refresh_duration=None, sheet_status=None):
+        # Build everything a session needs outside the lock, then swap the
+        # reference in one assignment
+        df = combine_sheets(self.store, self.sdm_mapping)
+        states = self.store.snapshot()
+        fetched = [state.fetched_at for state in states.values()]
+        previous = self._current
+        rollups, compliance, query = self._derive(df, previous)
+        version = DatasetVersion(
+            version=0,
+            df=df,
+            rollups=rollups,
+            compliance=compliance,
+            query=query,
+            published_at=time.time(),
+            data_fetched_at=min(fetched) if fetched else None,
+            refresh_duration=refresh_duration if refresh_duration is not None else (
+                previous.refresh_duration if previous is not None else None),
+            sheet_status=sheet_status if sheet_status is not None else {},
+            memory=memory_report(df),
+            district=self.district,
+            sdm_mapping=self.sdm_mapping,
+            health=sheet_health(self.store, self.sdm_mapping, self.base_url),
+            updates=extend_feed(previous.updates if previous is not None else None, self._feed_entries(states)),
+        )
+        with self._published:
+            self._version += 1
+            version = replace(version, version=self._version)
+            self._current = version
+            self._published.notify_all()
+        return version
+
+    def _derive(self, df, previous):
+        # Rollups, compliance matrix and query index for `df`. When `df` was
+        # patched from the previous version's frame, the previous structures
+        # get the same cell changes applied instead of being rebuilt.
+        changes = self.store.changes_since(previous.df) if previous is not None else None
+        if changes is not None:
+            with REGISTRY.timer("build", "apply changes"):
+                rollups = previous.rollups.apply_changes(changes)
+                compliance = previous.compliance.apply_changes(changes) if rollups is not None else None
+            if compliance is not None:
+                query = previous.query.with_counts(df)
+                put_rollups(df, rollups)
+                put_compliance(df, compliance)
+                put_query(df, query)
+                return rollups, compliance, query
+        return get_rollups(df), get_compliance(df), get_query(df)
+
+    def _feed_entries(self, states):
+        # Cell edits of the sheets that changed since the last publish
+        entries = [
+            feed_entries(state.changes, state.fetched_at)
+            for gid, state in states.items()
+            if state.changes is not None and gid in self._feed_digests
+            and state.base_digest == self._feed_digests[gid] and state.digest != state.base_digest
+        ]
+        self._feed_digests = {gid: state.digest for gid, state in states.items()}
+        entries = [entry for entry in entries if not entry.empty]
+        return pd.concat(entries, ignore_index=True) if entries else None
+
+
+def get_districts():
+    # District configs, read once per process
+    global _districts
+    with _refresher_lock:
+        if _districts is None:
+            _districts = load_districts()
+        return _districts
+
+
+def get_refresher(district=None):
+    # The process-wide refresher of one district (the first configured one
+    # by default), started on first use. Each district has its own store,
+    # snapshot directory and worker thread, so a slow or failing district
+    # never holds up the others.
+    districts = get_districts()
+    name = district or next(iter(districts))
+    with _refresher_lock:
+        refresher = _refreshers.get(name)
+        if refresher is None:
+            config = districts[name]
+            refresher = BackgroundRefresher(
+                store=SheetStore(), snapshot_dir=config.snapshot_dir, base_url=config.base_url,
+                sdm_mapping=config.sdm_mapping, district=name, ingest_mode=config.ingest_mode,
+            ).start()
+            _refreshers[name] = refresher
+        return refresher
+
+
+def start_all_refreshers():
+    # Start every configured district (each loads its snapshot first)
+    return {name: get_refresher(name) for name in get_districts()}
+
+
+def state_view(refreshers):
+    # StateRollups over the latest version of every district that has
+    # published one, plus those versions by district name
+    versions = {name: r.current() for name, r in refreshers.items()}
+    versions = {name: v for name, v in versions.items() if v is not None}
+    return StateRollups({name: v.rollups for name, v in versions.items()}), versions
@@ -0,0 +1,204 @@
+import argparse
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from compliance import get_compliance
+from data_config import SNAPSHOT_MAX_AGE
+from data_loader import load_dataset
+from districts import load_districts, slugify
+from rollups import get_rollups
+from sheet_store import SheetStore
+
+# Daily missing-form and performance reports for every SDM and SMO,
+# rendered offline from one loaded dataset, e.g. from cron:
+#
+#   python reports.py --out /var/www/reports
+#
+# The dataset is loaded (snapshot first, refreshed if older than
+# --max-age), its rollups and compliance matrix are built once, and the
+# per-SDM / per-SMO reports are rendered on a process pool that shares them.
+
+FORMATS = ("csv", "html")
+
+# Consecutive missed days that put a VLE on the streak list
+STREAK_DAYS = 3
+
+# Rollups and compliance matrix of the dataset, set once per worker process
+_worker_data = None
+
+
+def build_report(rollups, compliance, date, sdm=None, smo=None, streak_days=STREAK_DAYS):
+    # Sections of one report as {title: DataFrame}: the district with
+    # neither `sdm` nor `smo`, an SDM, or one SMO of an SDM (SMO names are
+    # only unique within an SDM)
+    date = pd.Timestamp(date)
+    streaks = compliance.streak_vles(streak_days, date, sdm, smo)
+    sections = {
+        "Summary": pd.DataFrame({
+            "Metric": [f"Cards issued on {date:%d %b %Y}", "Cards issued this week", "Cards issued this month",
+                       "Cards issued (all time)", "Forms missing", f"VLEs missing {streak_days}+ days in a row"],
+            "Value": [rollups.total("day", date, sdm, smo), rollups.total("week", date, sdm, smo),
+                      rollups.total("month", date, sdm, smo), rollups.total("all", None, sdm, smo),
+                      compliance.missing_total(date, sdm=sdm, smo=smo), len(streaks)],
+        }),
+    }
+    if smo is None:
+        level = "smo" if sdm is not None else "sdm"
+        missing = compliance.missing_counts(level, date, sdm=sdm)
+        name_col = "SMO Name" if sdm is not None else "SDM"
+        sections[f"Missing Forms by {'SMO' if sdm is not None else 'SDM'}"] = pd.DataFrame(
+            {name_col: list(missing), "Missing": list(missing.values())})
+    else:
+        status = rollups.table("vle", "day", date, sdm, smo)
+        sections["VLE Status"] = pd.DataFrame({
+            "VLE Name": status["VLE Name"].astype(object),
+            "Cards Issued": status["Cards Issued"].astype(object).where(status["Filled"] > 0, ""),
+            "Status": status["Filled"].map(lambda filled: "Filled" if filled else "Not Filled"),
+        })
+
+    vle_cols = [c for c in ("VLE Name", "SMO Name", "VLE Contact Number", "CSC ID")
+                if smo is None or c != "SMO Name"]
+    missing_vles = compliance.missing_vles(date, sdm, smo)
+    sections["VLEs Missing the Form"] = missing_vles[[c for c in vle_cols if c in missing_vles.columns]]
+    for label, period, key in (("Today", "day", date), ("All Time", "all", None)):
+        top, least = rollups.rank("vle", period, key, sdm=sdm, smo=smo, n=3)
+        sections[f"Top 3 VLEs ({label})"] = top
+        sections[f"Least 3 VLEs ({label})"] = least
+    sections[f"Missed {streak_days}+ Days in a Row"] = streaks[
+        [c for c in vle_cols + ["Days Missed"] if c in streaks.columns]]
+    return sections
+
+
+def write_report(sections, directory, title, formats=FORMATS):
+    # One CSV per section and / or a single report.html; returns the paths
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    if "csv" in formats:
+        for name, table in sections.items():
+            path = os.path.join(directory, f"{slugify(name, 'section')}.csv")
+            table.to_csv(path, index=False)
+            paths.append(path)
+    if "html" in formats:
+        body = "".join(
+            f"<h2>{html.escape(name)}</h2>"
+            + (table.to_html(index=False, na_rep="", border=0) if not table.empty else "<p>None</p>")
+            for name, table in sections.items()
+        )
+        path = os.path.join(directory, "report.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_page(title, body))
+        paths.append(path)
+    return paths
+
+
+def _page(title, body):
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title>"
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+        "td,th{padding:4px 10px;border-bottom:1px solid #ddd;text-align:left}</style>"
+        f"</head><body><h1>{html.escape(title)}</h1>"
+        f"<p>Generated {time.strftime('%d %b %Y %H:%M')}</p>{body}</body></html>"
+    )
+
+
+def _init_worker(rollups, compliance):
+    global _worker_data
+    _worker_data = (rollups, compliance)
+
+
+def _render(task):
+    # Render one (title, directory, date, sdm, smo, formats, streak_days)
+    # task with the worker's shared dataset
+    title, directory, date, sdm, smo, formats, streak_days = task
+    rollups, compliance = _worker_data
+    return write_report(build_report(rollups, compliance, date, sdm, smo, streak_days), directory, title, formats)
+
+
+def report_tasks(sdm_mapping, out_dir, date, district=None, formats=FORMATS, streak_days=STREAK_DAYS):
+    # The district report plus one per SDM and one per SMO
+    prefix = f"{district} " if district else ""
+    tasks = [(f"{prefix}District Report, {date:%d %b %Y}", out_dir, date, None, None, formats, streak_days)]
+    for sdm, smos in sdm_mapping.items():
+        sdm_dir = os.path.join(out_dir, slugify(sdm, "sdm"))
+        tasks.append((f"{sdm}, {date:%d %b %Y}", sdm_dir, date, sdm, None, formats, streak_days))
+        for smo_info in smos:
+            smo = smo_info["smo_name"]
+            tasks.append((f"{smo} ({sdm}), {date:%d %b %Y}", os.path.join(sdm_dir, slugify(smo, "smo")),
+                          date, sdm, smo, formats, streak_days))
+    return tasks
+
+
+def generate_reports(df, sdm_mapping, out_dir, date=None, district=None, formats=FORMATS, workers=None,
+                     streak_days=STREAK_DAYS):
+    # Render every report of one district's dataset under
+    # out_dir/<YYYY-MM-DD>/ and write an index.html linking them. `date`
+    # defaults to the latest date in the data, like the dashboards;
+    # workers=1 renders in this process. Returns the written paths.
+    rollups, compliance = get_rollups(df), get_compliance(df)
+    days = rollups.keys("day")
+    if not days:
+        return []
+    date = pd.Timestamp(date) if date is not None else days[-1]
+    day_dir = os.path.join(out_dir, f"{date:%Y-%m-%d}")
+    tasks = report_tasks(sdm_mapping, day_dir, date, district, formats, streak_days)
+
+    if workers == 1:
+        _init_worker(rollups, compliance)
+        rendered = [_render(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(rollups, compliance)) as pool:
+            rendered = list(pool.map(_render, tasks, chunksize=4))
+    paths = [path for written in rendered for path in written]
+
+    if "html" in formats:
+        links = "".join(
+            f"<li><a href='{html.escape(os.path.relpath(os.path.join(task[1], 'report.html'), day_dir))}'>"
+            f"{html.escape(task[0])}</a></li>"
+            for task in tasks
+        )
+        index = os.path.join(day_dir, "index.html")
+        with open(index, "w", encoding="utf-8") as f:
+            f.write(_page(f"{district + ' ' if district else ''}Reports, {date:%d %b %Y}", f"<ul>{links}</ul>"))
+        paths.append(index)
+    return paths
+
+
+def load_district(district, max_age=SNAPSHOT_MAX_AGE):
+    # The district's processed frame: its snapshot if younger than
+    # `max_age`, otherwise refreshed (and the snapshot updated) first
+    return load_dataset(max_age=max_age, hard_max_age=max_age, snapshot_dir=district.snapshot_dir,
+                        base_url=district.base_url, sdm_mapping=district.sdm_mapping, store=SheetStore(),
+                        ingest_mode=district.ingest_mode)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write daily SDM / SMO reports without the dashboard")
+    parser.add_argument("--out", default="reports", help="output directory")
+    parser.add_argument("--date", help="report date (YYYY-MM-DD); default: latest date in the data")
+    parser.add_argument("--district", action="append", help="only these districts (repeatable)")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--max-age", type=float, default=SNAPSHOT_MAX_AGE,
+                        help="refresh first if the snapshot is older than this many seconds")
+    parser.add_argument("--streak-days", type=int, default=STREAK_DAYS)
+    args = parser.parse_args()
+
+    districts = load_districts()
+    for name in args.district or districts:
+        if name not in districts:
+            parser.error(f"unknown district {name!r}")
+        district = districts[name]
+        start = time.monotonic()
+        df = load_district(district, args.max_age)
+        loaded = time.monotonic() - start
+        out_dir = os.path.join(args.out, district.slug) if len(districts) > 1 else args.out
+        paths = generate_reports(df, district.sdm_mapping, out_dir, args.date, name if len(districts) > 1 else None,
+                                 tuple(args.format), args.workers, args.streak_days)
+        print(f"{name}: {len(paths)} files in {out_dir} "
+              f"(load {loaded:.1f}s, render {time.monotonic() - start - loaded:.1f}s)")
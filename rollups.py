@@ -0,0 +1,241 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+import frame_cache
+from deltas import value_deltas
+from grouping import rank_groups, week_key, week_keys, week_str_to_key
+from metrics import REGISTRY
+
+# Grouping keys for each level, coarsest first
+LEVELS = {
+    "sdm": ["SDM"],
+    "smo": ["SDM", "SMO Name"],
+    "vle": ["SDM", "SMO Name", "VLE Name"],
+}
+
+# Index level holding the bucket for each period ("all" has none)
+PERIOD_COLUMNS = {"day": "Date", "week": "Week", "month": "Month", "all": None}
+
+METRICS = ["Cards Issued", "Filled", "Missing"]
+
+
+def period_key(date, period):
+    # Bucket key of a single date, matching the keys in the rollup index.
+    # Weeks may also be given as "2025-W04" or as the 202504 key itself.
+    if period == "week" and isinstance(date, str) and "-W" in date:
+        return week_str_to_key(date)
+    if period == "week" and isinstance(date, (int, np.integer)):
+        return int(date)
+    if period == "day":
+        return pd.Timestamp(date)
+    if period == "week":
+        return week_key(pd.Timestamp(date))
+    if period == "month":
+        return pd.Timestamp(date).to_period("M").to_timestamp()
+    return None
+
+
+def _period_column(df, period):
+    if period == "day":
+        return df["Date"]
+    if period == "week":
+        # process_data already carries the key; older snapshots may not
+        if "Week" in df.columns:
+            return df["Week"]
+        return pd.Series(week_keys(df["Date"]), index=df.index)
+    return df["Date"].dt.to_period("M").dt.to_timestamp()
+
+
+class Rollups:
+    # Sums, filled counts and missing counts at SDM / SMO / VLE level for
+    # every day, week and month, computed once per data refresh. The
+    # dashboards read these tables by index lookup instead of re-grouping
+    # the long frame on every rerun.
+
+    def __init__(self, df):
+        self.tables = {}
+        if df.empty:
+            return
+        base = df[LEVELS["vle"] + [c for c in ("Date", "Week") if c in df.columns]].copy()
+        base["Cards Issued"] = df["Cards Issued"]
+        base["Filled"] = df["Cards Issued"].notna().astype("int64")
+        base["Missing"] = 1 - base["Filled"]
+        base = base[base["Date"].notna()]
+
+        for period, column in PERIOD_COLUMNS.items():
+            keys = list(LEVELS["vle"])
+            if column is not None:
+                base[column] = _period_column(base, period)
+                keys = [column] + keys
+            vle_table = base.groupby(keys, dropna=False, observed=True, sort=True)[METRICS].sum()
+            self.tables[("vle", period)] = vle_table
+            for level in ("smo", "sdm"):
+                level_keys = ([column] if column is not None else []) + LEVELS[level]
+                self.tables[(level, period)] = vle_table.groupby(level=level_keys, dropna=False, sort=True).sum()
+
+    @property
+    def empty(self):
+        return not self.tables
+
+    def apply_changes(self, changes):
+        # New Rollups with value-only cell changes (see deltas.diff_slices)
+        # added into every table: each table is copied once and only the
+        # rows of the touched buckets are updated, so no regrouping of the
+        # long frame. Returns None if a change falls outside the existing
+        # rows (a new VLE or date), which needs a rebuild.
+        if self.empty:
+            return None
+        deltas = value_deltas(changes)
+        tables = {}
+        for (level, period), table in self.tables.items():
+            column = PERIOD_COLUMNS[period]
+            keys = ([column] if column is not None else []) + LEVELS[level]
+            if column is not None:
+                deltas[column] = _period_column(deltas, period)
+            summed = deltas.groupby(keys, dropna=False, sort=False)[METRICS].sum()
+            positions = table.index.get_indexer(summed.index)
+            if (positions < 0).any():
+                return None
+            table = table.copy()
+            try:
+                for metric in METRICS:
+                    values = table[metric].array.copy()
+                    values[positions] = values[positions] + summed[metric].to_numpy()
+                    table[metric] = values
+            except (TypeError, ValueError):  # fractional counts in an integer column
+                return None
+            tables[(level, period)] = table
+        patched = copy.copy(self)
+        patched.tables = tables
+        return patched
+
+    def table(self, level, period="all", key=None, sdm=None, smo=None):
+        # Rows of the (level, period) table, optionally narrowed to one
+        # period bucket and/or one SDM / SMO. Returns a flat DataFrame.
+        if self.empty:
+            return pd.DataFrame(columns=LEVELS[level] + METRICS)
+        table = self.tables[(level, period)]
+        column = PERIOD_COLUMNS[period]
+        selectors = {}
+        if column is not None and key is not None:
+            selectors[column] = period_key(key, period)
+        if sdm is not None:
+            selectors["SDM"] = sdm
+        if smo is not None:
+            selectors["SMO Name"] = smo
+        if selectors and table.index.nlevels == 1:
+            # ("sdm", "all") is indexed by SDM alone
+            table = table[table.index.isin(list(selectors.values()))]
+        elif selectors:
+            try:
+                table = table.xs(tuple(selectors.values()), level=list(selectors), drop_level=False)
+            except KeyError:
+                table = table.iloc[0:0]
+        return table.reset_index()
+
+    def keys(self, period, sdm=None, smo=None):
+        # Sorted period buckets that have data, e.g. the available weeks
+        table = self.table("smo" if smo is not None else "sdm", period, sdm=sdm, smo=smo)
+        return sorted(table[PERIOD_COLUMNS[period]].unique())
+
+    def totals(self, period="all", key=None, sdm=None, smo=None):
+        # Summed metrics for one slice, as a Series indexed by METRICS
+        level = "smo" if smo is not None else "sdm"
+        table = self.table(level, period, key, sdm, smo)
+        return table[METRICS].sum()
+
+    def total(self, period="all", key=None, sdm=None, smo=None, metric="Cards Issued"):
+        level = "smo" if smo is not None else "sdm"
+        return self.table(level, period, key, sdm, smo)[metric].sum()
+
+    def rank(self, level, period="all", key=None, sdm=None, smo=None, n=3,
+             metric="Cards Issued", exclude_zero=True, keep="first"):
+        # (top, bottom) n of the SDMs, SMOs or VLEs in a slice, ranked from
+        # the pre-summed table. Names are ranked as shown, so VLEs sharing a
+        # name are added up like a groupby on 'VLE Name' would.
+        name_col = LEVELS[level][-1]
+        table = self.table(level, period, key, sdm, smo)
+        return rank_groups(table, name_col, n, metric, exclude_zero, keep)
+
+    def missing_counts(self, level, period="day", key=None, sdm=None):
+        # {name: missing forms} for every SDM or SMO in the slice
+        table = self.table(level, period, key, sdm)
+        name_col = LEVELS[level][-1]
+        return dict(zip(table[name_col], table["Missing"]))
+
+
+class StateRollups:
+    # State-wide view over per-district Rollups. Built from each district's
+    # SDM tables (a few rows per period bucket), never from the long
+    # frames, so it is cheap to rebuild whenever any district publishes.
+
+    def __init__(self, parts):
+        # `parts` maps district name -> Rollups
+        self.tables = {}
+        parts = {name: part for name, part in parts.items() if not part.empty}
+        if not parts:
+            return
+        for period in PERIOD_COLUMNS:
+            frames = [part.tables[("sdm", period)] for part in parts.values()]
+            self.tables[period] = pd.concat(frames, keys=list(parts), names=["District"])
+
+    @property
+    def empty(self):
+        return not self.tables
+
+    def table(self, level="district", period="all", key=None, district=None):
+        # Per-district ("district") or per-SDM ("sdm") sums for one period,
+        # optionally narrowed to one bucket and/or district. Flat DataFrame.
+        names = ["District"] if level == "district" else ["District", "SDM"]
+        column = PERIOD_COLUMNS[period]
+        if self.empty:
+            return pd.DataFrame(columns=([column] if column else []) + names + METRICS)
+        table = self.tables[period]
+        selectors = {}
+        if column is not None and key is not None:
+            selectors[column] = period_key(key, period)
+        if district is not None:
+            selectors["District"] = district
+        if selectors:
+            try:
+                table = table.xs(tuple(selectors.values()), level=list(selectors), drop_level=False)
+            except KeyError:
+                table = table.iloc[0:0]
+        if level == "district":
+            table = table.groupby(level=([column] if column else []) + names, sort=True).sum()
+        return table.reset_index()
+
+    def keys(self, period, district=None):
+        return sorted(self.table("district", period, district=district)[PERIOD_COLUMNS[period]].unique())
+
+    def total(self, period="all", key=None, district=None, metric="Cards Issued"):
+        return self.table("district", period, key, district)[metric].sum()
+
+    def rank(self, level="district", period="all", key=None, district=None, n=3,
+             metric="Cards Issued", exclude_zero=True, keep="first"):
+        name_col = "District" if level == "district" else "SDM"
+        table = self.table(level, period, key, district)
+        if level == "sdm":
+            # SDM names are only unique within a district
+            table = table.assign(SDM=table["District"].astype(str) + " / " + table["SDM"].astype(str))
+        return rank_groups(table, name_col, n, metric, exclude_zero, keep)
+
+
+def put_rollups(df, rollups):
+    # Register Rollups built some other way (e.g. apply_changes) for `df`
+    frame_cache.put("rollups", df, rollups)
+
+
+def get_rollups(df):
+    # One Rollups per processed frame (see frame_cache)
+    cached = frame_cache.get("rollups", df)
+    if cached is not None:
+        REGISTRY.cache("rollups", True)
+        return cached
+    REGISTRY.cache("rollups", False)
+    with REGISTRY.timer("build", "rollups"):
+        rollups = Rollups(df)
+    put_rollups(df, rollups)
+    return rollups
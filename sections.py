@@ -0,0 +1,277 @@
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from grouping import week_key_to_str
+from metrics import REGISTRY, sheet_key
+from timeline import SERIES_COLUMNS, timeline_series
+
+# Dashboard sections that only recompute what their own inputs touch.
+# Each interactive section is a fragment, so its widgets rerun just that
+# section; tabs and expanders use on_change="rerun" so closed ones don't
+# execute at all; and the tables behind them are cached per dataset
+# version (district, version number) and inputs.
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def top_least_tables(_rollups, dataset_key, period, key=None, sdm=None, smo=None):
+    return _rollups.rank('vle', period, key, sdm=sdm, smo=smo, n=3)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def timeline_data(_rollups, dataset_key, level, start, end, bucket, rolling, filters):
+    return timeline_series(_rollups, level, start, end, bucket, rolling, **dict(filters))
+
+
+@st.fragment
+@REGISTRY.timed("section", "timeline")
+def timeline_chart(rollups, dataset_key, key_prefix, level, **filters):
+    # Line chart per SDM / SMO / VLE / district. The date range slider is
+    # the zoom: each change re-reads only that range, at a resolution that
+    # keeps the payload bounded (Streamlit does not report Plotly zoom
+    # events back to the script).
+    days = rollups.keys('day', **filters)
+    if not days:
+        st.write("No timeline data available.")
+        return
+    first, last = days[0].date(), days[-1].date()
+    c1, c2, c3 = st.columns([3, 1, 1])
+    if first < last:
+        start, end = c1.slider("Date range", first, last, (first, last), key=f"{key_prefix}_range")
+    else:
+        start, end = first, last
+    bucket = c2.selectbox("Resolution", ["auto", "day", "week", "month"], key=f"{key_prefix}_bucket")
+    rolling = c3.selectbox("Rolling average", [None, 3, 7], key=f"{key_prefix}_rolling",
+                           format_func=lambda w: "Off" if w is None else f"{w} periods")
+    series, bucket = timeline_data(rollups, dataset_key, level, pd.Timestamp(start), pd.Timestamp(end),
+                                   bucket, rolling, tuple(sorted(filters.items())))
+    if series.empty:
+        st.write("No timeline data available.")
+        return
+    name_col = SERIES_COLUMNS[level]
+    points = series.groupby(name_col).size().max()
+    fig = px.line(series, x='Date', y='Rolling' if rolling else 'Cards Issued', color=name_col,
+                  markers=points <= 60, labels={'Rolling': f"Cards Issued ({rolling}-{bucket} average)"})
+    st.caption(f"{bucket.capitalize()} totals")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def _top_least_columns(top, least, titles):
+    c1, c2 = st.columns(2)
+    if titles:
+        c1.write(titles[0])
+        c2.write(titles[1])
+    c1.table(top)
+    c2.table(least)
+
+
+@st.fragment
+@REGISTRY.timed("section", "top/least tables")
+def top_least_tabs(dataset, key_prefix, current_date, sdm=None, smo=None,
+                   titles=None, all_time_titles=None):
+    # Specific Date / Specific Week / All Time tables for the whole
+    # district, one SDM or one SMO. Only the open tab is computed.
+    rollups = dataset.rollups
+    tab1, tab2, tab3 = st.tabs(["Specific Date", "Specific Week", "All Time"],
+                               key=f"{key_prefix}_tabs", on_change="rerun")
+
+    with tab1:
+        if tab1.open:
+            d_sel = st.date_input("Select Date", current_date, key=f"{key_prefix}_date")
+            d_sel = pd.to_datetime(d_sel)
+            _top_least_columns(*top_least_tables(rollups, dataset.cache_key, 'day', d_sel, sdm, smo), titles)
+
+    with tab2:
+        if tab2.open:
+            w_avail = rollups.keys('week', sdm=sdm, smo=smo)
+            if w_avail:
+                w_sel = st.selectbox("Select Week", w_avail, index=len(w_avail)-1,
+                                     format_func=week_key_to_str, key=f"{key_prefix}_week")
+                _top_least_columns(*top_least_tables(rollups, dataset.cache_key, 'week', w_sel, sdm, smo), titles)
+            else:
+                st.write("No week data available.")
+
+    with tab3:
+        if tab3.open:
+            _top_least_columns(*top_least_tables(rollups, dataset.cache_key, 'all', None, sdm, smo),
+                               all_time_titles or titles)
+
+
+@REGISTRY.timed("section", "state overview")
+def state_overview(state, versions, current_date):
+    # District comparison from the combined per-district rollups
+    dataset_keys = tuple(sorted(v.cache_key for v in versions.values()))
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Cards Issued (All Time)", f"{state.total():,.0f}")
+    col2.metric(f"Issued Today ({current_date.strftime('%d %b')})", f"{state.total('day', current_date):,.0f}")
+    col3.metric("Missing Forms Today", f"{state.total('day', current_date, metric='Missing'):,.0f}")
+
+    summary = state.table('district')[['District', 'Cards Issued']].rename(
+        columns={'Cards Issued': 'All Time'})
+    for label, period in (("Today", "day"), ("This Week", "week"), ("This Month", "month")):
+        part = state.table('district', period, current_date)[['District', 'Cards Issued', 'Missing']]
+        part = part.rename(columns={'Cards Issued': label, 'Missing': f'Missing ({label})'})
+        summary = summary.merge(part, on='District', how='left')
+    st.dataframe(summary.fillna(0), hide_index=True)
+
+    best, worst = state.rank('sdm', n=3)
+    c1, c2 = st.columns(2)
+    c1.write("Top 3 SDMs")
+    c1.table(best)
+    c2.write("Least 3 SDMs")
+    c2.table(worst)
+
+    timeline_chart(state, dataset_keys, "state_timeline", "district")
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def compliance_heatmap_figure(_compliance, dataset_key, level, start, end, sdm=None):
+    share = _compliance.heatmap(level, start, end, sdm)
+    if share.empty:
+        return None
+    fig = px.imshow(share * 100, aspect='auto', color_continuous_scale='Reds', zmin=0, zmax=100,
+                    labels={'x': 'Date', 'y': level.upper(), 'color': '% missing'})
+    fig.update_layout(height=max(300, 22 * len(share) + 120))
+    return fig
+
+
+@st.fragment
+@REGISTRY.timed("section", "compliance history")
+def compliance_history(dataset, key_prefix, current_date, sdm=None):
+    # Missing-form share per SDM / SMO and day, plus the VLEs currently on
+    # a run of missed days; both straight from the compliance matrix
+    compliance = dataset.compliance
+    if compliance.empty:
+        st.write("No compliance data available.")
+        return
+    c1, c2 = st.columns(2)
+    level = 'smo' if sdm is not None else c1.radio(
+        "Group by", ['sdm', 'smo'], format_func=str.upper, horizontal=True, key=f"{key_prefix}_level")
+    days = c2.selectbox("Period", [30, 90, 365], format_func=lambda d: f"Last {d} days",
+                        key=f"{key_prefix}_days")
+    start = pd.Timestamp(current_date) - pd.Timedelta(days=days - 1)
+    fig = compliance_heatmap_figure(compliance, dataset.cache_key, level, start, pd.Timestamp(current_date), sdm)
+    if fig is not None:
+        st.plotly_chart(fig, use_container_width=True)
+
+    min_days = st.number_input("VLEs who missed at least this many days in a row", min_value=1,
+                               value=3, key=f"{key_prefix}_streak")
+    streaks = compliance.streak_vles(int(min_days), current_date, sdm=sdm)
+    if streaks.empty:
+        st.write("No VLE has missed that many days in a row.")
+    else:
+        st.dataframe(streaks[['VLE Name', 'SMO Name', 'VLE Contact Number', 'Days Missed']], hide_index=True)
+
+
+@st.fragment
+@REGISTRY.timed("section", "recent updates")
+def recent_updates(dataset, key_prefix, sdm=None, smo=None):
+    # Cell edits picked up by the latest refreshes, newest first
+    updates = dataset.updates
+    if updates is None or updates.empty:
+        st.caption("No edits detected since the dashboard started.")
+        return
+    if sdm is not None:
+        updates = updates[updates['SDM'] == sdm]
+    if smo is not None:
+        updates = updates[updates['SMO Name'] == smo]
+    expander = st.expander(f"Recent Updates ({len(updates)})", key=f"{key_prefix}_updates", on_change="rerun")
+    with expander:
+        if not expander.open:
+            return
+        if updates.empty:
+            st.write("No recent edits here.")
+            return
+        table = updates.assign(Date=updates['Date'].dt.strftime("%d %b"))
+        st.dataframe(table[['Detected', 'SDM', 'SMO Name', 'VLE Name', 'Date', 'Old', 'New', 'Change']],
+                     hide_index=True)
+
+
+def _missing_vle_table(missing_vles, empty_text):
+    if not missing_vles.empty:
+        st.table(missing_vles[['VLE Name', 'VLE Contact Number']])
+    else:
+        st.write(empty_text)
+
+
+@st.fragment
+@REGISTRY.timed("section", "missing forms drill-down")
+def missing_forms_drilldown(dataset, current_date):
+    # SDM > SMO > VLE missing forms for one date, all read from the
+    # compliance matrix; VLE lists only for expanders that are open.
+    compliance = dataset.compliance
+    date_filter = st.date_input("Select Date for Missing Forms", current_date)
+    date_filter = pd.to_datetime(date_filter)
+
+    sdm_missing = compliance.missing_counts('sdm', date_filter)
+
+    # Iterate SDMs
+    sdm_mapping = dataset.sdm_mapping
+    for sdm in sdm_mapping.keys():
+        missing_count = sdm_missing.get(sdm, 0)
+        sdm_expander = st.expander(f"{sdm} (Missing Forms: {missing_count})",
+                                   key=f"dc_missing_{sdm}", on_change="rerun")
+        with sdm_expander:
+            if not sdm_expander.open:
+                continue
+            smo_missing = compliance.missing_counts('smo', date_filter, sdm=sdm)
+            # Iterate SMOs in this SDM
+            for smo in [s['smo_name'] for s in sdm_mapping[sdm]]:
+                smo_expander = st.expander(f"{smo} (Missing: {smo_missing.get(smo, 0)})",
+                                           key=f"dc_missing_{sdm}_{smo}", on_change="rerun")
+                with smo_expander:
+                    if smo_expander.open:
+                        _missing_vle_table(compliance.missing_vles(date_filter, sdm, smo),
+                                           "All VLEs filled the form!")
+
+
+@st.fragment
+@REGISTRY.timed("section", "SMO drill-down")
+def smo_missing_drilldown(dataset, current_date, sdm):
+    rollups, compliance = dataset.rollups, dataset.compliance
+    smo_missing = compliance.missing_counts('smo', current_date, sdm=sdm)
+    for smo in rollups.table('smo', sdm=sdm)['SMO Name']:
+        expander = st.expander(f"{smo} (Missing: {smo_missing.get(smo, 0)})",
+                               key=f"sdm_missing_{sdm}_{smo}", on_change="rerun")
+        with expander:
+            if expander.open:
+                _missing_vle_table(compliance.missing_vles(current_date, sdm, smo), "No missing forms.")
+
+
+def diagnostics_panel(districts, registry=REGISTRY):
+    # Per-sheet fetch stats, stage / section timings and cache hit rates
+    # from the metrics registry, plus the whole registry as JSON
+    snapshot = registry.snapshot()
+    tabs = {sheet_key(s['gid'], district.base_url): (district.name, s['smo_name'])
+            for district in districts.values()
+            for smos in district.sdm_mapping.values() for s in smos}
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.write("Sheets")
+        sheets = pd.DataFrame([
+            {'District': tabs.get(key, ('', ''))[0], 'GID': stats.get('gid'),
+             'SMO': tabs.get(key, ('', ''))[1], 'Status': stats.get('status'),
+             'Latency (s)': stats.get('latency'), 'Bytes': stats.get('bytes'),
+             'Rows': stats.get('rows'), 'Cache': stats.get('cache'), 'Attempts': stats.get('attempts'),
+             'Breaker': stats.get('breaker'), 'Failures': stats.get('failures')}
+            for key, stats in snapshot['sheets'].items()
+        ])
+        st.dataframe(sheets, hide_index=True)
+
+        st.write("Timings")
+        timings = pd.DataFrame([
+            {'Kind': kind, 'Name': name, 'Count': stats['count'], 'Last (ms)': stats['last'] * 1000,
+             'Mean (ms)': stats['mean'] * 1000, 'Max (ms)': stats['max'] * 1000}
+            for kind, names in snapshot['timings'].items() if kind != 'fetch'
+            for name, stats in names.items()
+        ])
+        st.dataframe(timings, hide_index=True)
+
+        st.write("Caches")
+        caches = pd.DataFrame([
+            {'Cache': name, 'Hits': counts['hits'], 'Misses': counts['misses']}
+            for name, counts in snapshot['caches'].items()
+        ])
+        st.dataframe(caches, hide_index=True)
+
+        st.download_button("Export JSON", registry.to_json(), file_name="dashboard_metrics.json",
+                           mime="application/json")
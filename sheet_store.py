@@ -0,0 +1,97 @@
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class SheetState:
+    # Last successfully processed copy of one SMO tab.
+    # `frame` is that sheet's slice of the long-format dataset; the
+    # validators are replayed as conditional request headers.
+    gid: str
+    sdm: str
+    smo_name: str
+    frame: pd.DataFrame = field(default_factory=pd.DataFrame)
+    etag: str = None
+    last_modified: str = None
+    digest: str = None
+    fetched_at: float = 0.0
+    static_digest: str = None
+    # Cell-level changes against the state with digest `base_digest`
+    # (see deltas.diff_slices); None when there was nothing to compare
+    changes: pd.DataFrame = None
+    base_digest: str = None
+
+
+class SheetStore:
+    # Process-wide map of gid -> SheetState, safe to update from the
+    # fetch threads and read from Streamlit sessions at the same time.
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+        self._combined_key = None
+        self._combined = None
+        # Rows of every sheet in the combined frame, and the frame plus
+        # changes it was patched from (if it was)
+        self._layout = {}
+        self._patched_from = None
+        self._patch_changes = None
+        # Held for the duration of a refresh so only one runs at a time
+        self.refresh_lock = threading.Lock()
+        self.snapshot_loaded = False
+        # Body hash of the last whole-workbook download (workbook mode)
+        self.workbook_digest = None
+
+    def get(self, gid):
+        with self._lock:
+            return self._states.get(gid)
+
+    def put(self, state):
+        with self._lock:
+            self._states[state.gid] = state
+
+    def touch(self, gid, result):
+        # Sheet confirmed unchanged: refresh validators and timestamp only
+        with self._lock:
+            state = self._states.get(gid)
+            if state is not None:
+                self._states[gid] = replace(
+                    state,
+                    etag=result.etag or state.etag,
+                    last_modified=result.last_modified or state.last_modified,
+                    fetched_at=time.time(),
+                )
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._states)
+
+    def cached_combined(self, key):
+        with self._lock:
+            if self._combined_key == key:
+                return self._combined
+            return None
+
+    def combined(self):
+        # (key, frame, layout) of the last combined frame
+        with self._lock:
+            return self._combined_key, self._combined, self._layout
+
+    def set_combined(self, key, df, layout=None, patched_from=None, changes=None):
+        with self._lock:
+            self._combined_key = key
+            self._combined = df
+            self._layout = layout or {}
+            self._patched_from = patched_from
+            self._patch_changes = changes
+
+    def changes_since(self, df):
+        # Cell changes that turned `df` into the current combined frame,
+        # or None if the current frame was not patched from `df`
+        with self._lock:
+            if self._patched_from is not None and self._patched_from is df:
+                return self._patch_changes
+            return None
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+from data_config import SNAPSHOT_DIR
+from sheet_store import SheetState
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Snapshots are an optimisation; run without them
+    pa = None
+    feather = None
+
+MANIFEST_NAME = "manifest.json"
+
+
+def snapshots_available():
+    return pa is not None
+
+
+def _sheet_path(directory, gid):
+    return os.path.join(directory, f"{gid}.feather")
+
+
+def _atomic_write(path, write):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_snapshot(store, directory=SNAPSHOT_DIR, gids=None):
+    # Write every sheet slice as an uncompressed Feather (Arrow IPC) file so
+    # it can be memory-mapped on load, plus a manifest with the fetch
+    # timestamps and validators. Pass `gids` to only rewrite changed sheets.
+    if not snapshots_available():
+        return False
+    os.makedirs(directory, exist_ok=True)
+    states = store.snapshot()
+    for gid, state in states.items():
+        if gids is not None and gid not in gids:
+            continue
+        table = pa.Table.from_pandas(state.frame, preserve_index=False)
+        _atomic_write(_sheet_path(directory, gid),
+                      lambda path: feather.write_feather(table, path, compression="uncompressed"))
+
+    manifest = {
+        gid: {
+            "sdm": state.sdm,
+            "smo_name": state.smo_name,
+            "etag": state.etag,
+            "last_modified": state.last_modified,
+            "digest": state.digest,
+            "fetched_at": state.fetched_at,
+            "static_digest": state.static_digest,
+        }
+        for gid, state in states.items()
+    }
+
+    def write_manifest(path):
+        with open(path, "w") as f:
+            json.dump({"saved_at": time.time(), "sheets": manifest}, f)
+
+    _atomic_write(os.path.join(directory, MANIFEST_NAME), write_manifest)
+    return True
+
+
+def read_sheet(directory, gid):
+    with pa.memory_map(_sheet_path(directory, gid), "r") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def load_snapshot(store, directory=SNAPSHOT_DIR):
+    # Populate `store` from disk. Returns the number of sheets loaded;
+    # sheets whose file is missing or unreadable are skipped.
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not snapshots_available() or not os.path.exists(manifest_path):
+        return 0
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)["sheets"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable snapshot manifest: {e}")
+        return 0
+
+    loaded = 0
+    for gid, meta in manifest.items():
+        try:
+            frame = read_sheet(directory, gid)
+        except (OSError, pa.ArrowInvalid) as e:
+            print(f"Ignoring snapshot for GID {gid}: {e}")
+            continue
+        store.put(SheetState(
+            gid, meta["sdm"], meta["smo_name"], frame,
+            etag=meta.get("etag"), last_modified=meta.get("last_modified"),
+            digest=meta.get("digest"), fetched_at=meta.get("fetched_at", 0.0),
+            static_digest=meta.get("static_digest"),
+        ))
+        loaded += 1
+    return loaded
+
+
+def snapshot_age(store, now=None):
+    # Age in seconds of the oldest sheet in the store, None when empty
+    states = store.snapshot()
+    if not states:
+        return None
+    now = now if now is not None else time.time()
+    return now - min(state.fetched_at for state in states.values())
@@ -0,0 +1,673 @@
+import importlib.util
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+import threading
+import time
+import unittest
+from dataclasses import replace
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import data_loader
+import fetch_engine
+from fetch_engine import (
+    CircuitBreaker, backoff_delay, read_workbook, fetch_sheets,
+    STATUS_OK, STATUS_TIMEOUT, STATUS_ERROR, STATUS_NOT_MODIFIED, STATUS_UNCHANGED, STATUS_SKIPPED
+)
+from data_loader import fetch_all_data_with_status, load_dataset, sheet_health
+from sheet_store import SheetStore
+from snapshot_store import load_snapshot, save_snapshot
+from metrics import REGISTRY
+import refresher as refresher_module
+from districts import load_districts
+from benchmark import make_wide_sheet
+from compliance import ComplianceMatrix
+from query import DataQuery
+from refresher import BackgroundRefresher
+from rollups import Rollups
+
+SHEET_CSV = (
+    "Sr No,CSC ID,VLE Name,VLE Contact Number,SMO,26 Jan,27 Jan\n"
+    "1,C1,A,111,X,5,\n"
+    "2,C2,B,222,X,3,4\n"
+)
+
+
+class SheetServer:
+    # Local stand-in for the Google Sheets CSV export.
+    # `sheets` maps gid -> CSV text and `latency` maps gid -> seconds to
+    # sleep before answering. Gids listed in `etags` get an ETag header and
+    # honour If-None-Match. Unknown gids get a 404; gids in `outages` get a
+    # 503 that many times. `workbook` holds the xlsx bytes served for
+    # format=xlsx.
+
+    def __init__(self):
+        self.sheets = {}
+        self.latency = {}
+        self.etags = {}
+        self.outages = {}
+        self.requests = []
+        self.workbook = None
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                if query.get("format") == ["xlsx"]:
+                    server.requests.append("workbook")
+                    if server.workbook is None:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(server.workbook)))
+                    self.end_headers()
+                    self.wfile.write(server.workbook)
+                    return
+                gid = query.get("gid", [""])[0]
+                server.requests.append(gid)
+                time.sleep(server.latency.get(gid, 0))
+                if server.outages.get(gid):
+                    server.outages[gid] -= 1
+                    self.send_error(503)
+                    return
+                if gid not in server.sheets:
+                    self.send_error(404)
+                    return
+                etag = server.etags.get(gid)
+                if etag is not None and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = server.sheets[gid].encode("utf-8")
+                try:
+                    self.send_response(200)
+                    if etag is not None:
+                        self.send_header("ETag", etag)
+                    self.send_header("Content-Type", "text/csv; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client gave up at its deadline
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/export?format=csv&gid="
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestParallelFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def test_fetches_run_concurrently(self):
+        gids = [str(i) for i in range(8)]
+        for gid in gids:
+            self.server.sheets[gid] = SHEET_CSV
+            self.server.latency[gid] = 0.3
+        start = time.monotonic()
+        results = fetch_sheets(gids, base_url=self.server.base_url, max_workers=8,
+                               sheet_timeout=5, overall_timeout=5)
+        elapsed = time.monotonic() - start
+        self.assertTrue(all(r.status == STATUS_OK for r in results.values()))
+        self.assertEqual(len(results["0"].df), 2)
+        # Sequential would take 8 * 0.3s
+        self.assertLess(elapsed, 1.5)
+
+    def test_partial_results_with_per_gid_status(self):
+        self.server.sheets.update({"fast": SHEET_CSV, "slow": SHEET_CSV})
+        self.server.latency["slow"] = 2
+        results = fetch_sheets(["fast", "slow", "missing"], base_url=self.server.base_url,
+                               max_workers=3, sheet_timeout=5, overall_timeout=0.5)
+        self.assertEqual(results["fast"].status, STATUS_OK)
+        self.assertEqual(results["slow"].status, STATUS_TIMEOUT)
+        self.assertTrue(results["slow"].df.empty)
+        self.assertEqual(results["missing"].status, STATUS_ERROR)
+
+    def test_per_sheet_deadline(self):
+        self.server.sheets["slow"] = SHEET_CSV
+        self.server.latency["slow"] = 1
+        results = fetch_sheets(["slow"], base_url=self.server.base_url,
+                               sheet_timeout=0.3, overall_timeout=5)
+        self.assertEqual(results["slow"].status, STATUS_TIMEOUT)
+
+    def test_fetch_all_data_skips_failed_sheets(self):
+        self.server.sheets["1"] = SHEET_CSV
+        mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}, {"smo_name": "S2", "gid": "2"}]}
+        df, results = fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=mapping,
+                                                 store=SheetStore())
+        self.assertEqual(results["2"].status, STATUS_ERROR)
+        self.assertEqual(set(df['SMO Name']), {"S1"})
+        self.assertEqual(len(df), 4)
+
+
+class TestResilientFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.sheets.update({"1": SHEET_CSV, "2": SHEET_CSV})
+        patcher = mock.patch("fetch_engine.backoff_delay", return_value=0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, gids, **kwargs):
+        return fetch_sheets(gids, base_url=self.server.base_url, sheet_timeout=2, overall_timeout=5, **kwargs)
+
+    def test_backoff_is_jittered_and_capped(self):
+        delays = [backoff_delay(attempt, base=0.5, cap=4) for attempt in range(8) for _ in range(20)]
+        self.assertTrue(all(0 <= d <= 4 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_transient_errors_are_retried(self):
+        self.server.outages["1"] = 2
+        results = self.fetch(["1", "missing"], breaker=CircuitBreaker())
+        self.assertEqual((results["1"].status, results["1"].attempts), (STATUS_OK, 3))
+        # A 404 fails the same way every time
+        self.assertEqual((results["missing"].status, results["missing"].attempts), (STATUS_ERROR, 1))
+
+    def test_breaker_skips_failing_sheet_until_cooldown(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=0.3)
+        self.server.outages["1"] = 100
+        for _ in range(2):
+            self.assertEqual(self.fetch(["1"], breaker=breaker, retries=0)["1"].status, STATUS_ERROR)
+        requests_before = len(self.server.requests)
+        self.assertEqual(self.fetch(["1"], breaker=breaker, retries=0)["1"].status, STATUS_SKIPPED)
+        self.assertEqual(len(self.server.requests), requests_before)
+
+        time.sleep(0.35)
+        self.server.outages["1"] = 0
+        self.assertEqual(self.fetch(["1"], breaker=breaker, retries=0)["1"].status, STATUS_OK)
+        self.assertEqual(breaker.health(self.server.base_url + "1")["state"], "closed")
+
+    def test_failed_sheet_serves_last_good_copy(self):
+        mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}, {"smo_name": "S2", "gid": "2"}]}
+        store = SheetStore()
+        first, _ = fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=mapping, store=store)
+        self.server.sheets["1"] = SHEET_CSV.replace(",5,", ",6,")
+        self.server.outages["2"] = 100
+        df, results = fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=mapping, store=store)
+        self.assertEqual(results["2"].status, STATUS_ERROR)
+        self.assertEqual(set(df['SMO Name']), {"S1", "S2"})
+        self.assertEqual(len(df), len(first))
+        health = sheet_health(store, mapping, self.server.base_url)
+        self.assertTrue(health["2"]["stale"])
+        self.assertFalse(health["1"]["stale"])
+
+        # The outage alone does not rebuild the combined frame
+        again, _ = fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=mapping, store=store)
+        self.assertIs(again, df)
+
+
+class TestIncrementalRefresh(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}, {"smo_name": "S2", "gid": "2"}]}
+        self.server.sheets.update({"1": SHEET_CSV, "2": SHEET_CSV})
+        self.store = SheetStore()
+
+    def load(self):
+        return fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=self.mapping,
+                                          store=self.store)
+
+    def test_etag_not_modified_skips_processing(self):
+        self.server.etags.update({"1": '"v1"', "2": '"v1"'})
+        first, _ = self.load()
+        with mock.patch.object(data_loader, "process_data", wraps=data_loader.process_data) as spy:
+            second, results = self.load()
+        self.assertEqual(results["1"].status, STATUS_NOT_MODIFIED)
+        spy.assert_not_called()
+        self.assertIs(first, second)
+
+    def test_hash_fallback_rebuilds_only_changed_sheet(self):
+        first, _ = self.load()
+        self.server.sheets["2"] = SHEET_CSV.replace("2,C2,B,222,X,3,4", "2,C2,B,222,X,3,9")
+        with mock.patch.object(data_loader, "process_data", wraps=data_loader.process_data) as spy:
+            second, results = self.load()
+        self.assertEqual(results["1"].status, STATUS_UNCHANGED)
+        self.assertEqual(results["2"].status, STATUS_OK)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first['Cards Issued'].sum(), 24)
+        self.assertEqual(second['Cards Issued'].sum(), 29)
+
+    def test_unchanged_body_not_parsed(self):
+        # No ETag: the body comes again but hashes the same, stored sheets
+        # streamed or not
+        self.load()
+        with mock.patch.object(fetch_engine.pd, "read_csv", wraps=fetch_engine.pd.read_csv) as spy:
+            _, results = self.load()
+        self.assertEqual({result.status for result in results.values()}, {STATUS_UNCHANGED})
+        spy.assert_not_called()
+
+    def test_sheets_with_fewer_days_get_missing_rows(self):
+        self.server.sheets["1"] = SHEET_CSV.replace("27 Jan\n", "27 Jan,28 Jan\n").replace(",\n", ",,1\n").replace(",4\n", ",4,2\n")
+        df, _ = self.load()
+        s2_late = df[(df['SMO Name'] == "S2") & (df['Date'] == data_loader.parse_date("28 Jan"))]
+        self.assertEqual(len(s2_late), 2)
+        self.assertTrue(s2_late['Cards Issued'].isna().all())
+
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.sheets["1"] = SHEET_CSV
+        self.server.etags["1"] = '"v1"'
+        REGISTRY.reset()
+        self.addCleanup(REGISTRY.reset)
+
+    def test_records_sheet_stats_and_cache_hits(self):
+        mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}]}
+        store = SheetStore()
+        df, _ = fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=mapping, store=store)
+        key = self.server.base_url + "1"
+        sheet = REGISTRY.snapshot()["sheets"][key]
+        self.assertEqual((sheet["status"], sheet["cache"], sheet["rows"]), (STATUS_OK, "miss", len(df)))
+        self.assertEqual(sheet["bytes"], len(SHEET_CSV))
+
+        fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=mapping, store=store)
+        snapshot = json.loads(REGISTRY.to_json())
+        self.assertEqual(snapshot["sheets"][key]["cache"], "hit")
+        self.assertEqual(snapshot["caches"]["sheet"], {"hits": 1, "misses": 1})
+        self.assertEqual(snapshot["timings"]["fetch"][key]["count"], 2)
+        self.assertEqual(snapshot["timings"]["process_data"]["melt"]["count"], 1)
+
+def make_workbook(tabs):
+    # xlsx bytes with one tab per title -> CSV text
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for title, csv in tabs.items():
+            pd.read_csv(io.StringIO(csv)).to_excel(writer, sheet_name=title, index=False)
+    return buffer.getvalue()
+
+
+@unittest.skipIf(importlib.util.find_spec("openpyxl") is None, "workbook mode needs openpyxl")
+class TestWorkbookIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.changed = SHEET_CSV.replace("2,C2,B,222,X,3,4", "2,C2,B,222,X,3,9")
+        self.server.sheets.update({"1": SHEET_CSV, "2": self.changed})
+        self.server.workbook = make_workbook({"S1": SHEET_CSV, "Other": self.changed})
+        self.mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"},
+                                  {"smo_name": "S2", "gid": "2", "sheet": "Other"}]}
+
+    def load(self, store, mode):
+        return fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=self.mapping,
+                                          store=store, ingest_mode=mode)
+
+    def test_matches_per_tab_mode_with_one_request(self):
+        by_tab, _ = self.load(SheetStore(), "tabs")
+        self.server.requests.clear()
+        store = SheetStore()
+        by_workbook, results = self.load(store, "workbook")
+        self.assertEqual(self.server.requests, ["workbook"])
+        self.assertTrue(all(result.ok for result in results.values()))
+        columns = ['SMO Name', 'VLE Name', 'Date', 'Cards Issued']
+        pd.testing.assert_frame_equal(
+            by_workbook[columns].astype(object).sort_values(columns[:3]).reset_index(drop=True),
+            by_tab[columns].astype(object).sort_values(columns[:3]).reset_index(drop=True))
+
+        # Same bytes again: nothing parsed; one tab edited: only it is
+        with mock.patch.object(data_loader, "process_data", wraps=data_loader.process_data) as spy:
+            _, results = self.load(store, "workbook")
+            self.assertEqual(results["1"].status, STATUS_UNCHANGED)
+            self.server.workbook = make_workbook({"S1": SHEET_CSV, "Other": SHEET_CSV})
+            df, results = self.load(store, "workbook")
+        self.assertEqual((results["1"].status, results["2"].status), (STATUS_UNCHANGED, STATUS_OK))
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(df['Cards Issued'].sum(), 24)
+
+    def test_open_breaker_skips_tab(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        store = SheetStore()
+        with mock.patch.object(data_loader, "BREAKER", breaker):
+            self.load(store, "workbook")
+            # Tab missing once: its breaker opens
+            self.server.workbook = make_workbook({"S1": SHEET_CSV})
+            self.load(store, "workbook")
+            self.server.workbook = make_workbook({"S1": SHEET_CSV, "Other": SHEET_CSV})
+            df, results = self.load(store, "workbook")
+            self.assertEqual(results["2"].status, STATUS_SKIPPED)
+            self.assertEqual(df['Cards Issued'].sum(), 29)  # the stored copy
+            # Closed again: the edit made meanwhile is picked up
+            breaker.reset()
+            df, results = self.load(store, "workbook")
+        self.assertEqual(results["2"].status, STATUS_OK)
+        self.assertEqual(df['Cards Issued'].sum(), 24)
+
+    def test_local_workbook_file_and_missing_tabs(self):
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as f:
+            f.write(self.server.workbook)
+            f.flush()
+            with open(f.name, "rb") as workbook:
+                frames = read_workbook(workbook.read(), {"1": "S1", "3": "Nope"})
+        self.assertEqual(list(frames), ["1"])
+        self.assertListEqual(list(frames["1"].columns[-2:]), ["26 Jan", "27 Jan"])
+
+        self.mapping["SDM A"].append({"smo_name": "S3", "gid": "3"})
+        _, results = self.load(SheetStore(), "workbook")
+        self.assertEqual(results["3"].status, STATUS_ERROR)
+        self.assertTrue(results["1"].ok)
+
+
+class TestStreamingIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}]}
+        self.end = datetime.now() - timedelta(days=1)
+        self.wide = make_wide_sheet(6, 10, end=self.end).drop(columns=['SDM', 'SMO Name'])
+        self.server.sheets["1"] = self.wide.to_csv(index=False)
+        self.store = SheetStore()
+
+    def load(self):
+        return fetch_all_data_with_status(base_url=self.server.base_url, sdm_mapping=self.mapping,
+                                          store=self.store)
+
+    def assertMatchesFullParse(self, df, wide):
+        expected = data_loader.build_sheet_slice(wide.copy(), "SDM A", "S1")
+        key = ['VLE Name', 'Date']
+        got = df.sort_values(key)[key + ['Cards Issued']].reset_index(drop=True)
+        want = expected.sort_values(key)[key + ['Cards Issued']].reset_index(drop=True)
+        pd.testing.assert_frame_equal(got.astype(object), want.astype(object))
+
+    def test_new_day_parsed_incrementally(self):
+        self.load()
+        wide = self.wide.copy()
+        wide[self.end.strftime("%d %b")] = [1, 2, 3, 4, 5, 6]
+        wide[(self.end + timedelta(days=1)).strftime("%d %b")] = [7, None, 9, None, 11, 12]
+        self.server.sheets["1"] = wide.to_csv(index=False)
+        df, results = self.load()
+        self.assertTrue(results["1"].partial)
+        # Look-back day, the edited newest day and the new day
+        parsed_days = [c for c in results["1"].df.columns if c not in data_loader.STATIC_COLS]
+        self.assertEqual(len(parsed_days), 3)
+        self.assertMatchesFullParse(df, wide)
+
+    def test_full_year_sheet_streams_recent_days_only(self):
+        # Last year's columns that read as next month must not be re-added
+        self.wide = make_wide_sheet(3, 365, end=self.end).drop(columns=['SDM', 'SMO Name'])
+        self.server.sheets["1"] = self.wide.to_csv(index=False)
+        self.load()
+        wide = self.wide.copy()
+        wide[self.end.strftime("%d %b")] = [1, 2, 3]
+        self.server.sheets["1"] = wide.to_csv(index=False)
+        df, results = self.load()
+        self.assertTrue(results["1"].partial)
+        self.assertEqual(len(df), 3 * 365)
+        self.assertMatchesFullParse(df, wide)
+
+    def test_changed_vle_rows_fall_back_to_full_parse(self):
+        self.load()
+        wide = pd.concat([self.wide, self.wide.iloc[[0]].assign(**{'VLE Name': 'New VLE'})])
+        self.server.sheets["1"] = wide.to_csv(index=False)
+        df, results = self.load()
+        self.assertTrue(results["1"].partial)
+        self.assertIn('New VLE', set(df['VLE Name']))
+        self.assertMatchesFullParse(df, wide)
+
+
+class TestSnapshotStartup(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.sheets.update({"1": SHEET_CSV, "2": SHEET_CSV})
+        self.mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}, {"smo_name": "S2", "gid": "2"}]}
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def load(self, store, **kwargs):
+        return load_dataset(snapshot_dir=self.dir, base_url=self.server.base_url,
+                            sdm_mapping=self.mapping, store=store, **kwargs)
+
+    def test_cold_start_writes_snapshot(self):
+        df = self.load(SheetStore())
+        self.assertEqual(len(df), 8)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "1.feather")))
+        restored = SheetStore()
+        self.assertEqual(load_snapshot(restored, self.dir), 2)
+        self.assertEqual(restored.get("1").frame['Cards Issued'].sum(), 12)
+
+    def test_fresh_snapshot_starts_without_network(self):
+        first = self.load(SheetStore())
+        requests_before = len(self.server.requests)
+        second = self.load(SheetStore())
+        self.assertEqual(len(self.server.requests), requests_before)
+        self.assertEqual(second['Cards Issued'].sum(), first['Cards Issued'].sum())
+
+    def test_stale_snapshot_served_while_refreshing(self):
+        self.load(SheetStore())
+        requests_before = len(self.server.requests)
+        self.server.latency.update({"1": 0.5, "2": 0.5})
+        store = SheetStore()
+        start = time.monotonic()
+        df = self.load(store, max_age=0)
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(len(df), 8)
+        deadline = time.monotonic() + 5
+        while len(self.server.requests) < requests_before + 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(len(self.server.requests), requests_before + 2)
+
+
+
+class TestBackgroundRefresher(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.sheets.update({"1": SHEET_CSV, "2": SHEET_CSV})
+        mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}, {"smo_name": "S2", "gid": "2"}]}
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.refresher = BackgroundRefresher(interval=60, store=SheetStore(), snapshot_dir=tmp.name,
+                                             base_url=self.server.base_url, sdm_mapping=mapping)
+        self.addCleanup(self.refresher.stop)
+
+    def test_publishes_versions_without_blocking_readers(self):
+        self.assertIsNone(self.refresher.current())
+        self.refresher.start()
+        first = self.refresher.wait_for_version(timeout=5)
+        self.assertEqual(len(first.df), 8)
+        self.assertEqual(first.rollups.total(), 24)
+        self.assertIsNotNone(first.refresh_duration)
+        self.assertLess(first.age, 5)
+
+        self.server.latency["1"] = 0.5
+        self.refresher.request_refresh()
+        self.assertIs(self.refresher.current(), first)  # readers keep the old version meanwhile
+        deadline = time.monotonic() + 5
+        while self.refresher.current() is first and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.refresher.current().version, first.version + 1)
+
+    def test_too_old_snapshot_is_not_published(self):
+        self.refresher.refresh_once()
+        for days_old, published in ((0, True), (2, False)):
+            store = SheetStore()
+            load_snapshot(store, self.refresher.snapshot_dir)
+            for state in store.snapshot().values():
+                store.put(replace(state, fetched_at=time.time() - days_old * 86400))
+            tmp = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp.cleanup)
+            save_snapshot(store, tmp.name)
+            self.server.latency.update({"1": 0.5, "2": 0.5})
+            refresher = BackgroundRefresher(interval=60, store=SheetStore(), snapshot_dir=tmp.name,
+                                            base_url=self.server.base_url, sdm_mapping=self.refresher.sdm_mapping,
+                                            hard_max_age=86400)
+            self.addCleanup(refresher.stop)
+            refresher.start()
+            with self.subTest(days_old=days_old):
+                self.assertEqual(refresher.current() is not None, published)
+                if not published:
+                    # Readers block until the first refresh instead
+                    self.assertLess(refresher.wait_for_version(timeout=5).age, 5)
+
+    def test_concurrent_refreshes_are_single_flight(self):
+        self.server.latency.update({"1": 0.3, "2": 0.3})
+        threads = [threading.Thread(target=self.refresher.refresh_once) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.refresher.current().version, 1)
+
+
+class TestDeltaUpdates(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.end = datetime.now() - timedelta(days=1)
+        self.day = self.end.strftime("%d %b")
+        self.wides = {}
+        for gid, smo in (("1", "S1"), ("2", "S2")):
+            wide = make_wide_sheet(5, 8, end=self.end, seed=int(gid), first_vle=10 * int(gid))
+            self.wides[gid] = wide.drop(columns=['SDM', 'SMO Name'])
+            self.server.sheets[gid] = self.wides[gid].to_csv(index=False)
+        mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}, {"smo_name": "S2", "gid": "2"}]}
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.refresher = BackgroundRefresher(interval=60, store=SheetStore(), snapshot_dir=tmp.name,
+                                             base_url=self.server.base_url, sdm_mapping=mapping)
+
+    def edit(self, gid, wide):
+        self.wides[gid] = wide
+        self.server.sheets[gid] = wide.to_csv(index=False)
+
+    def assertMatchesRebuild(self, version):
+        rebuilt = Rollups(version.df)
+        for key, table in rebuilt.tables.items():
+            pd.testing.assert_frame_equal(version.rollups.tables[key].astype('float64'), table.astype('float64'))
+        matrix = ComplianceMatrix(version.df)
+        self.assertTrue((version.compliance.missing == matrix.missing).all())
+        self.assertTrue((version.compliance.filled == matrix.filled).all())
+        pd.testing.assert_frame_equal(version.query.frame, DataQuery(version.df).frame)
+
+    def test_cell_edits_patch_dataset_and_feed(self):
+        first = self.refresher.refresh_once()
+        self.assertTrue(first.updates.empty)
+        wide = self.wides["1"].copy()
+        wide[self.day] = [None, 7, 7, 7, 7]
+        wide.loc[1, self.day] = None
+        wide.loc[2, self.day] = 19 if pd.isna(self.wides["1"].loc[2, self.day]) else self.wides["1"].loc[2, self.day] + 1
+        self.edit("1", wide)
+        second = self.refresher.refresh_once()
+
+        # Patched from the first version rather than rebuilt
+        self.assertIsNotNone(self.refresher.store.changes_since(first.df))
+        self.assertIsNot(second.rollups, first.rollups)
+        self.assertMatchesRebuild(second)
+        before = first.df.loc[first.df['Date'] == first.df['Date'].max()]
+        after = second.df.loc[second.df['Date'] == second.df['Date'].max()]
+        edited = before['Cards Issued'].astype('Float64').compare(after['Cards Issued'].astype('Float64'))
+        self.assertEqual(len(second.updates), len(edited))
+        self.assertEqual(set(second.updates['SMO Name']), {"S1"})
+        self.assertTrue(set(second.updates['Change']) <= {"filled", "updated", "cleared"})
+
+    def test_reordered_rows_rebuild(self):
+        # Same cells, different row order: nothing to patch by position
+        first = self.refresher.refresh_once()
+        wide = self.wides["1"].iloc[::-1].reset_index(drop=True)
+        wide.loc[0, self.day] = 50
+        self.edit("1", wide)
+        second = self.refresher.refresh_once()
+        self.assertIsNone(self.refresher.store.changes_since(first.df))
+        self.assertMatchesRebuild(second)
+        rows = second.df[(second.df['SMO Name'] == "S1") & (second.df['Date'] == second.df['Date'].max())]
+        expected = wide.set_index('VLE Name')[self.day].astype('float64')
+        got = rows.set_index(rows['VLE Name'].astype(object))['Cards Issued'].astype('float64')
+        pd.testing.assert_series_equal(got.reindex(expected.index), expected, check_names=False)
+
+    def test_new_day_rebuilds(self):
+        first = self.refresher.refresh_once()
+        wide = self.wides["2"].copy()
+        wide[(self.end + timedelta(days=1)).strftime("%d %b")] = [1, None, 3, None, 5]
+        self.edit("2", wide)
+        second = self.refresher.refresh_once()
+        self.assertIsNone(self.refresher.store.changes_since(first.df))
+        self.assertMatchesRebuild(second)
+        # New cells that already hold a count show up as filled
+        self.assertEqual(list(second.updates['Change']), ["filled"] * 3)
+
+
+class TestDistricts(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SheetServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.sheets["1"] = SHEET_CSV
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, config):
+        with open(os.path.join(self.dir.name, name), "w") as f:
+            json.dump(config, f)
+
+    def test_load_directory_and_default(self):
+        self.write("a.json", {"name": "A", "sheet_id": "sa", "sdm_mapping": {"SDM A": []}})
+        self.write("b.json", [{"name": "B", "sheet_id": "sb", "sdm_mapping": {}}])
+        districts = load_districts(self.dir.name)
+        self.assertEqual(list(districts), ["A", "B"])
+        self.assertIn("/d/sa/export", districts["A"].base_url)
+        self.assertEqual(len(load_districts(os.path.join(self.dir.name, "none"))), 1)
+        self.write("c.json", {"name": "A", "sheet_id": "sc", "sdm_mapping": {}})
+        with self.assertRaises(ValueError):
+            load_districts(self.dir.name)
+
+    def test_districts_refresh_independently(self):
+        # "Broken" has no sheets on the server; "Good" still publishes
+        mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}]}
+        broken = {"SDM B": [{"smo_name": "S9", "gid": "9"}]}
+        self.write("d.json", [
+            {"name": "Good", "sheet_id": "g", "sdm_mapping": mapping, "export_url": self.server.base_url},
+            {"name": "Broken", "sheet_id": "b", "sdm_mapping": broken, "export_url": self.server.base_url},
+        ])
+        districts = load_districts(self.dir.name)
+        with mock.patch.object(refresher_module, "_districts", districts), \
+             mock.patch.object(refresher_module, "_refreshers", {}), \
+             mock.patch("districts.SNAPSHOT_DIR", self.dir.name):
+            refreshers = refresher_module.start_all_refreshers()
+            for r in refreshers.values():
+                self.addCleanup(r.stop)
+            good = refreshers["Good"].wait_for_version(timeout=5)
+            refreshers["Broken"].wait_for_version(timeout=5)
+            state, versions = refresher_module.state_view(refreshers)
+        self.assertEqual((good.district, good.cache_key), ("Good", ("Good", 1)))
+        self.assertNotEqual(refreshers["Good"].store, refreshers["Broken"].store)
+        self.assertEqual(state.total(), good.rollups.total())
+        self.assertListEqual(state.table('district')['District'].tolist(), ["Good"])
+
+
+if __name__ == '__main__':
+    unittest.main()
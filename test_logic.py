@@ -1,8 +1,26 @@
 
+import contextlib
+import io
+import os
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
-from utils import calculate_top_3, calculate_least_3, get_missing_forms_count
+from datetime import datetime
+from utils import (
+    calculate_top_3, calculate_least_3, get_missing_forms_count, filter_by_date, filter_by_week,
+    get_available_weeks
+)
+from grouping import rank_groups
+from data_loader import parse_date, process_data
+from utils import memory_report
+from rollups import Rollups, StateRollups, get_rollups
+import frame_cache
+from compliance import ComplianceMatrix
+from timeline import choose_bucket, timeline_series
+from benchmark import bench_pipeline, make_state, make_wide_sheet
+from query import DataQuery, week_bounds
+from reports import build_report, generate_reports
 
 class TestDashboardLogic(unittest.TestCase):
     
@@ -40,5 +58,355 @@ class TestDashboardLogic(unittest.TestCase):
         count = get_missing_forms_count(self.df)
         self.assertEqual(count, 1)
 
+class TestDateParsing(unittest.TestCase):
+
+    def test_year_boundary(self):
+        today = datetime(2026, 1, 3)
+        self.assertEqual(parse_date("30 Dec", today), datetime(2025, 12, 30))
+        self.assertEqual(parse_date("02 Jan", today), datetime(2026, 1, 2))
+        self.assertIsNone(parse_date("Unnamed: 7", today))
+
+    def test_full_year_uses_column_order(self):
+        # 365 daily columns: the oldest month of headers would be a month
+        # ahead of today if each were read on its own
+        today = datetime(2026, 10, 17)
+        wide = make_wide_sheet(2, 365, end=today)
+        dates = process_data(wide, today=today)['Date'].drop_duplicates()
+        self.assertEqual(dates.min(), pd.Timestamp(2025, 10, 18))
+        self.assertEqual(dates.max(), pd.Timestamp(today))
+        self.assertTrue(dates.is_monotonic_increasing)
+        self.assertEqual(len(dates), 365)
+        # Columns a few days out of order keep their year
+        swapped = wide[['VLE Name', '17 Oct', '15 Oct', '16 Oct']]
+        self.assertEqual(process_data(swapped, today=today)['Date'].dt.year.unique().tolist(), [2026])
+
+    def test_vectorized_matches_per_row(self):
+        today = datetime(2026, 1, 3)
+        wide = pd.DataFrame({
+            'VLE Name': ['A', 'B'], 'SDM': 'S', 'SMO Name': 'M',
+            '30 Dec': [1, np.nan], '31 Dec': [2, 3], '01 Jan': [np.nan, 4], 'Notes': ['x', 'y'],
+        })
+        melted = process_data(wide, today=today, compact=False)
+        expected = melted['Date_Str'].astype(object).apply(lambda h: parse_date(h, today))
+        self.assertListEqual(melted['Date'].tolist(), pd.to_datetime(expected).tolist())
+        self.assertEqual(melted['Date'].min(), pd.Timestamp(2025, 12, 30))
+        self.assertEqual(len(melted), 6)
+
+    def test_week_key_column(self):
+        wide = pd.DataFrame({'VLE Name': ['A'], 'SDM': 'S', 'SMO Name': 'M',
+                             '31 Dec': [1], '03 Jan': [2], '05 Jan': [3]})
+        melted = process_data(wide, today=datetime(2026, 1, 6))
+        self.assertListEqual(melted['Week'].tolist(), [202552, 202600, 202601])
+        self.assertListEqual(melted['Week'].tolist(),
+                             [int(d.strftime('%Y%U')) for d in melted['Date']])
+        self.assertListEqual(get_available_weeks(melted), ['2025-W52', '2026-W00', '2026-W01'])
+
+class TestCompactFrame(unittest.TestCase):
+
+    def setUp(self):
+        self.wide = pd.DataFrame({
+            'CSC ID': ['C1', 'C2', 'C3'], 'VLE Name': ['A', 'B', 'C'],
+            'VLE Contact Number': ['1', '2', '3'], 'SDM': 'S', 'SMO Name': 'M',
+            '01 Jan': [1, np.nan, 3], '02 Jan': [0, 5, np.nan],
+        })
+
+    def test_compact_dtypes(self):
+        df = process_data(self.wide, today=datetime(2026, 1, 6))
+        self.assertNotIn('Date_Str', df.columns)
+        self.assertEqual(str(df['Cards Issued'].dtype), 'Int16')
+        self.assertEqual(df['SDM'].dtype, 'category')
+        self.assertEqual(get_missing_forms_count(df), 2)
+        self.assertEqual(calculate_top_3(df, 'VLE Name')['VLE Name'].tolist(), ['B', 'C', 'A'])
+
+    def test_memory_report(self):
+        loose = memory_report(process_data(self.wide, compact=False))
+        report = memory_report(process_data(self.wide))
+        self.assertEqual(report['rows'], 6)
+        self.assertAlmostEqual(report['bytes_per_row'], report['total_bytes'] / 6)
+        self.assertLess(report['total_bytes'], loose['total_bytes'])
+
+class TestFrameCache(unittest.TestCase):
+
+    def test_entries_belong_to_their_frame(self):
+        df = pd.DataFrame({'SDM': ['S'], 'SMO Name': ['M'], 'VLE Name': ['A'],
+                           'Date': pd.to_datetime(['2025-01-01']), 'Cards Issued': [1.0]})
+        rollups = get_rollups(df)
+        self.assertIs(get_rollups(df), rollups)
+        self.assertIsNone(frame_cache.get("rollups", df.copy()))
+        # A dead frame's entry is never handed to a frame reusing its id
+        key = id(df)
+        del df
+        for _ in range(100):
+            other = pd.DataFrame({'a': [1]})
+            if id(other) == key:
+                break
+        self.assertIsNone(frame_cache.get("rollups", other))
+
+    def test_eviction(self):
+        frames = [pd.DataFrame({'a': [i]}) for i in range(frame_cache.CACHE_SIZE + 1)]
+        for i, frame in enumerate(frames):
+            frame_cache.put("test", frame, i)
+        self.assertIsNone(frame_cache.get("test", frames[0]))
+        self.assertEqual(frame_cache.get("test", frames[-1]), len(frames) - 1)
+
+class TestRollups(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'SDM': ['S1', 'S1', 'S1', 'S2', 'S1', 'S1', 'S1', 'S2'],
+            'SMO Name': ['M1', 'M1', 'M2', 'M3'] * 2,
+            'VLE Name': ['A', 'B', 'C', 'D'] * 2,
+            'Date': pd.to_datetime(['2025-01-30'] * 4 + ['2025-02-01'] * 4),
+            'Cards Issued': [10, np.nan, 5, 2, 1, 4, np.nan, np.nan],
+        })
+        self.rollups = Rollups(self.df)
+
+    def test_totals_match_frame(self):
+        self.assertEqual(self.rollups.total(), 22)
+        self.assertEqual(self.rollups.total('day', '2025-01-30'), 17)
+        self.assertEqual(self.rollups.total('month', '2025-02-01', sdm='S1'), 5)
+        self.assertEqual(self.rollups.total('week', '2025-01-30', metric='Missing'), 3)
+        self.assertEqual(self.rollups.total('day', '2025-03-01'), 0)
+        self.assertEqual(self.rollups.total(sdm='S2'), 2)
+
+    def test_missing_counts(self):
+        self.assertEqual(self.rollups.missing_counts('sdm', 'day', '2025-02-01'), {'S1': 1, 'S2': 1})
+        self.assertEqual(self.rollups.missing_counts('smo', 'day', '2025-01-30', 'S1'), {'M1': 1, 'M2': 0})
+
+    def test_ranking_from_rollup_matches_frame(self):
+        top = calculate_top_3(self.rollups.table('vle'), 'VLE Name')
+        self.assertListEqual(top['VLE Name'].tolist(), calculate_top_3(self.df, 'VLE Name')['VLE Name'].tolist())
+        self.assertListEqual(self.rollups.keys('week'), [202504])
+
+    def test_rank_levels(self):
+        top, bottom = self.rollups.rank('sdm', n=1, exclude_zero=False)
+        self.assertEqual((top['SDM'].iloc[0], bottom['SDM'].iloc[0]), ('S1', 'S2'))
+        top, bottom = self.rollups.rank('vle', 'day', '2025-02-01', sdm='S1', n=5)
+        self.assertListEqual(top['VLE Name'].tolist(), ['B', 'A', 'C'])
+        self.assertListEqual(bottom['VLE Name'].tolist(), ['A', 'B'])
+
+    def test_state_rollups_combine_districts(self):
+        other = Rollups(self.df.assign(**{'Cards Issued': self.df['Cards Issued'] * 2}))
+        state = StateRollups({'D1': self.rollups, 'D2': other})
+        self.assertEqual(state.total(), 66)
+        self.assertEqual(state.total('day', '2025-01-30', district='D2'), 34)
+        self.assertEqual(state.table('district')['District'].tolist(), ['D1', 'D2'])
+        self.assertEqual(state.rank('sdm', n=1)[0]['SDM'].iloc[0], 'D2 / S1')
+        self.assertTrue(StateRollups({}).empty)
+
+    def test_state_rank_with_categorical_names(self):
+        # process_data stores the names as categoricals
+        df = self.df.astype({'SDM': 'category', 'SMO Name': 'category', 'VLE Name': 'category'})
+        state = StateRollups({'D1': Rollups(df), 'D2': Rollups(df)})
+        self.assertEqual(state.rank('sdm', n=1)[0]['SDM'].iloc[0], 'D1 / S1')
+
+class TestRanking(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'VLE Name': ['A', 'B', 'C', 'D', 'E', 'A'],
+            'Cards Issued': [5, 10, 10, 0, np.nan, 5],
+        })
+
+    def test_single_pass_matches_full_sort(self):
+        top, bottom = rank_groups(self.df, 'VLE Name', n=2)
+        sums = self.df.groupby('VLE Name')['Cards Issued'].sum()
+        self.assertListEqual(top['Cards Issued'].tolist(), sums.sort_values(ascending=False).head(2).tolist())
+        self.assertListEqual(bottom['Cards Issued'].tolist(), [10, 10])
+
+    def test_ties_and_zeroes(self):
+        top, _ = rank_groups(self.df, 'VLE Name', n=1, keep='all')
+        self.assertListEqual(top['VLE Name'].tolist(), ['A', 'B', 'C'])
+        _, bottom = rank_groups(self.df, 'VLE Name', n=2, exclude_zero=False)
+        self.assertListEqual(bottom['VLE Name'].tolist(), ['D', 'E'])
+
+class TestComplianceMatrix(unittest.TestCase):
+
+    def setUp(self):
+        # VLE A misses 3 days in a row, B only the 2nd, C (S2) everything
+        dates = pd.to_datetime(['2025-01-01', '2025-01-02', '2025-01-03', '2025-01-04'])
+        self.df = pd.DataFrame({
+            'SDM': ['S1'] * 8 + ['S2'] * 4,
+            'SMO Name': ['M1'] * 8 + ['M2'] * 4,
+            'VLE Name': ['A'] * 4 + ['B'] * 4 + ['C'] * 4,
+            'Date': list(dates) * 3,
+            'Cards Issued': [4, np.nan, np.nan, np.nan, 1, np.nan, 2, 3] + [np.nan] * 4,
+        })
+        self.matrix = ComplianceMatrix(self.df)
+
+    def test_counts_match_frame(self):
+        rollups = Rollups(self.df)
+        for date in self.df['Date'].unique():
+            self.assertEqual(self.matrix.missing_counts('sdm', date), rollups.missing_counts('sdm', 'day', date))
+            day = self.df[self.df['Date'] == date]
+            self.assertEqual(self.matrix.missing_total(date), day['Cards Issued'].isna().sum())
+        self.assertEqual(self.matrix.missing_counts('smo', start='2025-01-02', end='2025-01-03', sdm='S1'),
+                         {'M1': 3})
+        self.assertListEqual(self.matrix.missing_vles('2025-01-02', sdm='S1')['VLE Name'].tolist(), ['A', 'B'])
+        self.assertTrue(self.matrix.missing_vles('2025-02-01').empty)
+
+    def test_duplicate_and_blank_vle_rows(self):
+        # Repeated VLE rows and rows without a name or contact are separate
+        # sheet rows, so each one's missing form counts, as in the rollups
+        wide = pd.DataFrame({
+            'VLE Name': ['A', 'A', None, None, 'B'],
+            'VLE Contact Number': ['1', '1', None, None, None],
+            'SDM': 'S1', 'SMO Name': 'M1',
+            '15 Oct': [np.nan, np.nan, np.nan, np.nan, np.nan],
+            '16 Oct': [2, np.nan, np.nan, np.nan, 1],
+        })
+        df = process_data(wide, today=datetime(2025, 10, 17))
+        matrix, rollups = ComplianceMatrix(df), Rollups(df)
+        for date, expected in (('2025-10-15', 5), ('2025-10-16', 3)):
+            self.assertEqual(matrix.missing_total(date), expected)
+            self.assertEqual(matrix.missing_total(date), sum(rollups.missing_counts('smo', 'day', date).values()))
+            self.assertEqual(matrix.missing_total(date), get_missing_forms_count(filter_by_date(df, date)))
+        self.assertEqual(len(matrix.missing_vles('2025-10-15')), 5)
+        # Filling the second blank row only changes that row
+        changes = pd.DataFrame({'SDM': ['S1'], 'SMO Name': ['M1'], 'VLE Name': [np.nan],
+                                'VLE Contact Number': [np.nan], 'Date': [pd.Timestamp('2025-10-16')],
+                                '_n': [1], 'Old': [np.nan], 'New': [4.0], 'Change': ['filled']})
+        patched = matrix.apply_changes(changes)
+        self.assertEqual(patched.missing_total('2025-10-16'), 2)
+
+    def test_streaks(self):
+        self.assertListEqual(self.matrix.current_streaks().tolist(), [3, 0, 4])
+        self.assertListEqual(self.matrix.current_streaks('2025-01-02').tolist(), [1, 1, 2])
+        self.assertListEqual(self.matrix.longest_streaks().tolist(), [3, 1, 4])
+        self.assertListEqual(self.matrix.streak_vles(3)['VLE Name'].tolist(), ['C', 'A'])
+
+    def test_heatmap(self):
+        share = self.matrix.heatmap('smo')
+        self.assertListEqual(share.index.tolist(), ['S1 / M1', 'S2 / M2'])
+        self.assertListEqual(share.iloc[0].tolist(), [0.0, 1.0, 0.5, 0.5])
+
+class TestTimeline(unittest.TestCase):
+
+    def setUp(self):
+        wide = make_wide_sheet(6, 300, end=datetime(2025, 12, 31), seed=3)
+        wide['VLE Name'] = ['A', 'B', 'C', 'D', 'E', 'F']
+        self.df = process_data(wide, today=datetime(2025, 12, 31))
+        self.rollups = Rollups(self.df)
+
+    def test_bucket_follows_range(self):
+        self.assertEqual(choose_bucket('2025-01-01', '2025-04-30', 120), 'day')
+        self.assertEqual(choose_bucket('2025-01-01', '2025-12-31', 120), 'week')
+        self.assertEqual(choose_bucket('2020-01-01', '2025-12-31', 120), 'month')
+
+    def test_series_are_bounded_and_add_up(self):
+        total = self.df['Cards Issued'].sum()
+        for bucket in ('auto', 'day', 'month'):
+            series, used = timeline_series(self.rollups, 'vle', bucket=bucket, max_series=4)
+            self.assertEqual(series['Cards Issued'].sum(), total)
+            self.assertEqual(series['VLE Name'].nunique(), 4)
+            self.assertIn('Others', set(series['VLE Name']))
+        series, used = timeline_series(self.rollups, 'sdm', max_points=60)
+        self.assertEqual(used, 'week')
+        self.assertLessEqual(len(series), 60)
+        self.assertEqual(series['Cards Issued'].sum(), total)
+
+        series, used = timeline_series(self.rollups, 'sdm', start='2025-12-01', end='2025-12-10', rolling=3)
+        self.assertEqual((used, len(series)), ('day', 10))
+        day = self.df[self.df['Date'].between('2025-12-01', '2025-12-03')]
+        self.assertAlmostEqual(series['Rolling'].iloc[2], day['Cards Issued'].sum() / 3)
+
+class TestDataQuery(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        n = 400
+        self.df = pd.DataFrame({
+            'SDM': rng.choice(['S1', 'S2', 'S3'], n),
+            'SMO Name': rng.choice(['M1', 'M2'], n),
+            'VLE Name': rng.choice(list('ABCDEFG'), n),
+            'Date': pd.Timestamp('2024-12-20') + pd.to_timedelta(rng.integers(0, 30, n), unit='D'),
+            'Cards Issued': rng.integers(0, 9, n).astype(float),
+        })
+        self.query = DataQuery(self.df)
+
+    def assertSameRows(self, got, expected):
+        self.assertListEqual(sorted(got.index), sorted(expected.index))
+
+    def test_slices_match_masks(self):
+        df = self.df
+        day = pd.Timestamp('2025-01-02')
+        self.assertSameRows(self.query.slice(date=day), df[df['Date'] == day])
+        self.assertSameRows(self.query.slice(date=day, sdm='S2'), df[(df['Date'] == day) & (df['SDM'] == 'S2')])
+        self.assertSameRows(self.query.slice(smo='M1'), df[df['SMO Name'] == 'M1'])
+        self.assertSameRows(self.query.slice(week='2025-W00', sdm='S1', smo='M2'),
+                            df[(df['Date'].dt.strftime('%Y-W%U') == '2025-W00')
+                               & (df['SDM'] == 'S1') & (df['SMO Name'] == 'M2')])
+        self.assertTrue(self.query.slice(sdm='nobody').empty)
+
+    def test_week_bounds_clip_to_year(self):
+        self.assertEqual(week_bounds('2025-W00'), (pd.Timestamp('2025-01-01'), pd.Timestamp('2025-01-04')))
+        self.assertEqual(week_bounds('2024-W52'), (pd.Timestamp('2024-12-29'), pd.Timestamp('2024-12-31')))
+
+    def test_utils_filters_do_not_mutate(self):
+        df = self.df
+        week = filter_by_week(df, '2024-W51')
+        self.assertSameRows(week, df[df['Date'].dt.strftime('%Y-W%U') == '2024-W51'])
+        self.assertNotIn('Week', df.columns)
+        self.assertSameRows(filter_by_date(df, '2024-12-25'), df[df['Date'] == '2024-12-25'])
+
+class TestReports(unittest.TestCase):
+
+    def setUp(self):
+        end = datetime(2025, 3, 31)
+        self.mapping = {"SDM A": [{"smo_name": "S1", "gid": "1"}, {"smo_name": "S2", "gid": "2"}],
+                        "SDM B": [{"smo_name": "S1", "gid": "3"}]}
+        frames = [
+            process_data(make_wide_sheet(5, 10, end=end, seed=i, sdm=sdm, smo_name=smo["smo_name"],
+                                         first_vle=10 * i), today=end)
+            for i, (sdm, smo) in enumerate((sdm, smo) for sdm, smos in self.mapping.items() for smo in smos)
+        ]
+        self.df = pd.concat(frames, ignore_index=True)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def test_smo_report_matches_frame(self):
+        sections = build_report(Rollups(self.df), ComplianceMatrix(self.df), '2025-03-31', 'SDM B', 'S1')
+        day = self.df[(self.df['Date'] == '2025-03-31') & (self.df['SDM'] == 'SDM B')]
+        summary = dict(zip(sections['Summary']['Metric'], sections['Summary']['Value']))
+        self.assertEqual(summary['Cards issued on 31 Mar 2025'], day['Cards Issued'].sum())
+        self.assertEqual(summary['Forms missing'], day['Cards Issued'].isna().sum())
+        self.assertListEqual(sections['VLEs Missing the Form']['VLE Name'].tolist(),
+                             day.loc[day['Cards Issued'].isna(), 'VLE Name'].tolist())
+        self.assertEqual((sections['VLE Status']['Status'] == 'Not Filled').sum(), summary['Forms missing'])
+
+    def test_pool_writes_every_report(self):
+        serial = generate_reports(self.df, self.mapping, os.path.join(self.dir, "serial"), workers=1)
+        pooled = generate_reports(self.df, self.mapping, os.path.join(self.dir, "pool"), workers=2)
+        # District, 2 SDMs and 3 SMOs, each with a report.html, plus the index
+        self.assertEqual(sum(p.endswith("report.html") for p in pooled), 6)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "pool", "2025-03-31", "index.html")))
+        self.assertEqual(len(serial), len(pooled))
+        for path in serial:
+            if path.endswith(".csv"):
+                other = path.replace(os.path.join(self.dir, "serial"), os.path.join(self.dir, "pool"))
+                pd.testing.assert_frame_equal(pd.read_csv(path), pd.read_csv(other))
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_state_has_unique_sheets_and_vles(self):
+        state = make_state(3, 2, 3, 10, 5, end=datetime(2025, 3, 31))
+        gids = [gid for _, sheets in state.values() for gid in sheets]
+        self.assertEqual(len(gids), len(set(gids)))
+        vles = pd.concat(pd.read_csv(io.BytesIO(body))['VLE Name']
+                         for _, sheets in state.values() for body in sheets.values())
+        self.assertEqual(vles.nunique(), 10)
+
+    def test_scaled_pipeline_runs_every_stage(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            rows = bench_pipeline(2, 2, 12, 5, repeat=1, n_districts=2, memory=False)
+        names = [row[0] for row in rows]
+        self.assertEqual(names.count("index"), 1)
+        self.assertIn("state rollups", names)
+        self.assertIn("state view", names)
+        self.assertIn("state view", out.getvalue())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import pandas as pd
+
+from data_config import TIMELINE_MAX_POINTS, TIMELINE_MAX_SERIES
+from grouping import week_key
+from query import week_bounds
+from rollups import PERIOD_COLUMNS
+
+# Bucket sizes, finest first
+BUCKETS = ("day", "week", "month")
+
+# Name column of the series for each rollup level
+SERIES_COLUMNS = {"district": "District", "sdm": "SDM", "smo": "SMO Name", "vle": "VLE Name"}
+
+OTHERS = "Others"
+
+
+def choose_bucket(start, end, max_points=TIMELINE_MAX_POINTS):
+    # Finest bucket that keeps the range within `max_points` per series
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    if days <= max_points:
+        return "day"
+    if days / 7 <= max_points:
+        return "week"
+    return "month"
+
+
+def _bucket_dates(table, bucket):
+    # x-axis date of every row: the day, the (year-clipped) first day of
+    # the week, or the first of the month
+    column = table[PERIOD_COLUMNS[bucket]]
+    if bucket == "week":
+        starts = {key: week_bounds(int(key))[0] for key in column.unique()}
+        return column.map(starts).astype("datetime64[ns]")
+    return column
+
+
+def _in_range(table, bucket, start, end):
+    column = table[PERIOD_COLUMNS[bucket]]
+    if bucket == "day":
+        return (column >= start) & (column <= end)
+    if bucket == "week":
+        return (column >= week_key(start)) & (column <= week_key(end))
+    return (column >= start.to_period("M").to_timestamp()) & (column <= end)
+
+
+def timeline_series(rollups, level="sdm", start=None, end=None, bucket="auto", rolling=None,
+                    metric="Cards Issued", max_points=TIMELINE_MAX_POINTS, max_series=TIMELINE_MAX_SERIES,
+                    **filters):
+    # Plot-ready long frame (Date, <name>, metric[, Rolling]) for a range,
+    # read from the pre-aggregated rollup tables of `rollups` (a Rollups or
+    # StateRollups; `filters` are passed to its table(), e.g. sdm= / smo=
+    # or district=). With bucket="auto" the resolution follows the range so
+    # every series has at most `max_points` points; beyond `max_series`
+    # series the smallest are summed into "Others". `rolling` is a window,
+    # in buckets, for a trailing mean per series. Returns (frame, bucket).
+    name_col = SERIES_COLUMNS[level]
+    columns = ["Date", name_col, metric] + (["Rolling"] if rolling else [])
+    days = rollups.keys("day", **filters)
+    if not days:
+        return pd.DataFrame(columns=columns), "day"
+    start = max(pd.Timestamp(start), days[0]) if start is not None else days[0]
+    end = min(pd.Timestamp(end), days[-1]) if end is not None else days[-1]
+    if bucket == "auto":
+        bucket = choose_bucket(start, end, max_points)
+
+    table = rollups.table(level, bucket, **filters)
+    table = table[_in_range(table, bucket, start, end)]
+    frame = pd.DataFrame({
+        "Date": _bucket_dates(table, bucket).to_numpy(),
+        name_col: table[name_col].astype(object).to_numpy(),
+        metric: table[metric].to_numpy(),
+    })
+
+    totals = frame.groupby(name_col)[metric].sum()
+    if len(totals) > max_series:
+        keep = set(totals.nlargest(max_series - 1).index)
+        frame[name_col] = frame[name_col].where(frame[name_col].isin(keep), OTHERS)
+    # Also merges names repeated under several parents (e.g. an SMO in two SDMs)
+    frame = frame.groupby(["Date", name_col], as_index=False, sort=True)[metric].sum()
+
+    if rolling:
+        frame = frame.sort_values([name_col, "Date"], kind="stable")
+        frame["Rolling"] = (frame.groupby(name_col)[metric]
+                            .transform(lambda s: s.rolling(rolling, min_periods=1).mean()))
+        frame = frame.sort_values(["Date", name_col], kind="stable").reset_index(drop=True)
+    return frame[columns], bucket
@@ -1,10 +1,12 @@
 
 import pandas as pd
+from grouping import rank_groups, week_key_to_str, week_keys
+from query import get_query
 
 def get_available_dates(df):
     if df.empty or 'Date' not in df.columns:
         return []
-    return sorted(df['Date'].dropna().unique())
+    return get_query(df).dates()
 
 def get_week_str(date):
     # Returns "Year-Week" string, e.g., "2025-W04"
@@ -13,23 +15,24 @@ def get_week_str(date):
 def get_available_weeks(df):
     if df.empty or 'Date' not in df.columns:
         return []
-    df['Week'] = df['Date'].apply(get_week_str)
-    return sorted(df['Week'].unique())
+    if 'Week' in df.columns:
+        keys = pd.unique(df['Week'].dropna())
+    else:
+        keys = pd.unique(week_keys(pd.unique(df['Date'].dropna())))
+    return [week_key_to_str(int(k)) for k in sorted(keys)]
 
 def filter_by_date(df, date):
     # date can be a datetime object or string
     if df.empty:
         return df
-    # Ensure comparison works (timestamps)
-    return df[df['Date'] == pd.to_datetime(date)]
+    # Binary search over the indexed frame instead of a full-frame mask
+    return get_query(df).slice(date=pd.to_datetime(date))
 
-def filter_by_week(df, week_str):
+def filter_by_week(df, week):
+    # `week` is a "2025-W04" string or a 202504 week key
     if df.empty:
         return df
-    # Ensure Week column exists
-    if 'Week' not in df.columns:
-        df['Week'] = df['Date'].apply(get_week_str)
-    return df[df['Week'] == week_str]
+    return get_query(df).slice(week=week)
 
 def get_missing_forms_count(df):
     # Count rows where 'Cards Issued' is NaN
@@ -41,25 +44,24 @@ def get_missing_vles(df):
     return df[df['Cards Issued'].isna()]
 
 def calculate_top_3(df, group_by_col, metric_col='Cards Issued'):
-    # Sum metric by group
-    grouped = df.groupby(group_by_col)[metric_col].sum().reset_index()
-    # Sort desc
-    sorted_df = grouped.sort_values(by=metric_col, ascending=False)
-    return sorted_df.head(3)
+    return rank_groups(df, group_by_col, 3, metric_col)[0]
 
 def calculate_least_3(df, group_by_col, metric_col='Cards Issued'):
-    # Sum metric by group
-    grouped = df.groupby(group_by_col)[metric_col].sum().reset_index()
-    
-    # Filter out 0s to make the list useful (show low performers, not non-performers)
-    # Non-performers (0/NaN) are captured in "Missing Forms" or just have 0.
-    # Given the high number of NaNs/0s, showing random 0s is useless.
-    # We will show the least among those who have > 0.
-    filtered_grouped = grouped[grouped[metric_col] > 0]
-    
-    sorted_df = filtered_grouped.sort_values(by=metric_col, ascending=True)
-    return sorted_df.head(3)
+    return rank_groups(df, group_by_col, 3, metric_col)[1]
 
 def aggregate_metrics(df):
     total = df['Cards Issued'].sum()
     return total
+
+def memory_report(df):
+    # Footprint of the long frame: total bytes, bytes per row and the
+    # per-column breakdown (strings and categories counted deeply)
+    usage = df.memory_usage(deep=True, index=True)
+    total = int(usage.sum())
+    rows = len(df)
+    return {
+        'rows': rows,
+        'total_bytes': total,
+        'bytes_per_row': total / rows if rows else 0.0,
+        'columns': {col: int(size) for col, size in usage.items()},
+    }